@@ -0,0 +1,266 @@
+# Query budgets of the CLI actions: every command runs on a small and a large
+# synthetic db (benchmarks/gmsdb.py), the statements sqlite ran are counted
+# through DbFile.trace and the fetched rows through --stats json. Every run is
+# cold, on a fresh copy of the db with an empty cache dir, so the sidecar indexes
+# and the player manifest are built inside the measured run. A command fails
+# when it didn't do its job (no output, no ops written or removed, ...), when it
+# runs more statements or fetches more rows than benchmarks/budgets.json allows,
+# or when its statement count grows with the data (a per-row query) and the
+# budget doesn't say it may. --update rewrites the table with the measured
+# numbers, a command may only grow when it's named in --allow-growth (or was
+# allowed before). A "note" in the table says why a budget is what it is.
+#   python -m benchmarks.budget [--only names] [--update [--allow-growth names]]
+import os
+import io
+import sys
+import json
+import shutil
+import sqlite3
+import argparse
+import tempfile
+import contextlib
+from benchmarks import gmsdb
+from gpau_objects.common import Logger
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+BUDGETS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "budgets.json")
+
+SIZES = {
+    "small": {"games": 20, "achs": 5, "ops": 20},
+    "large": {"games": 60, "achs": 40, "ops": 100},
+}
+
+# pending ops and the surplus copies of duplicated ones, before or after a command
+State = Dict[str, int]
+# (placeholders, state before, state after, output) -> what's wrong or None
+Check = Callable[[Dict[str, str], State, State, str], Optional[str]]
+
+def shows(*tokens: str) -> Check:
+    # the output names every token, e.g. the listed game or achievement
+    def check(fill: Dict[str, str], before: State, after: State, output: str) -> Optional[str]:
+        missing = [x.format(**fill) for x in tokens if x.format(**fill) not in output]
+        return f"output doesn't show {', '.join(missing)}" if missing else None
+    return check
+
+def adds_ops(count: int) -> Check:
+    def check(fill: Dict[str, str], before: State, after: State, output: str) -> Optional[str]:
+        if after["ops"] - before["ops"] < count:
+            return f"wrote {after['ops'] - before['ops']} pending ops, expected at least {count}"
+        return None
+    return check
+
+def removes_ops(left: Optional[int]=None, dups: bool=False) -> Check:
+    # left: ops there must be afterwards, dups: duplicated ops must be gone
+    def check(fill: Dict[str, str], before: State, after: State, output: str) -> Optional[str]:
+        if after["ops"] >= before["ops"]:
+            return f"pending ops went from {before['ops']} to {after['ops']}"
+        if left is not None and after["ops"] != left:
+            return f"{after['ops']} pending ops left, expected {left}"
+        if dups and after["dups"]:
+            return f"{after['dups']} duplicated pending ops left"
+        return None
+    return check
+
+# name -> (script, argv, check), {package} {game_id} {game_name} {cc_id} {ach} {ach2}
+# {unlocked} {secret} {op} {player} are filled in per db
+COMMANDS: Dict[str, Tuple[str, List[str], Check]] = {
+    "gpau --list-cc": ("gpau", ["--list-cc"], shows("{package}")),
+    "gpau --list-games": ("gpau", ["--list-games"], shows("{package}")),
+    "gpau --list-players": ("gpau", ["--list-players"], shows("{player}")),
+    "gpau --list-ops": ("gpau", ["--list-ops"], shows("{op}")),
+    "gpau --list-achs": ("gpau", ["--list-achs", "-a", "{package}"], shows("{ach}", "{unlocked}")),
+    "gpau --list-u-achs": ("gpau", ["--list-u-achs", "-a", "{package}"], shows("{unlocked}")),
+    "gpau --list-nu-achs": ("gpau", ["--list-nu-achs", "-a", "{package}"], shows("{ach}")),
+    "gpau --list-sec-achs": ("gpau", ["--list-sec-achs", "-a", "{package}"], shows("{secret}")),
+    "gpau --search-games": ("gpau", ["--search-games", "{game_name}"], shows("{package}")),
+    "gpau --search-achs": ("gpau", ["--search-achs", "Collect"], shows("Collect")),
+    "gpau --search-achs --fuzzy": ("gpau", ["--search-achs", "colect", "--fuzzy"], shows("Collect")),
+    "gpau --unlock-id": ("gpau", ["--unlock-id", "{ach}"], adds_ops(1)),
+    "gpau --unlock-all": ("gpau", ["--unlock-all", "-a", "{package}", "--auto-inc-achs"], adds_ops(2)),
+    "gpau --rem-dup-ops": ("gpau", ["--rem-dup-ops"], removes_ops(dups=True)),
+    "gpau --compact-ops": ("gpau", ["--compact-ops"], removes_ops(dups=True)),
+    "gpau --rem-all-ops": ("gpau", ["--rem-all-ops"], removes_ops(left=0)),
+    "nicecli --games": ("nicecli", ["--games"], shows("{package}")),
+    "nicecli --players": ("nicecli", ["--players"], shows("{player}")),
+    "nicecli --ops": ("nicecli", ["--ops"], shows("{op}")),
+    "nicecli --all-games": ("nicecli", ["--all-games"], shows("{package}")),
+    "nicecli --all-games-n": ("nicecli", ["--all-games-n"], shows("{package}")),
+    "nicecli --info": ("nicecli", ["--info", "-g", "{game_id}"], shows("{package}")),
+    "nicecli --show": ("nicecli", ["--show", "-g", "{package}"], shows("{ach}", "{unlocked}")),
+    "nicecli --unlock": ("nicecli", ["--unlock", "{ach}"], adds_ops(1)),
+    "nicecli --unlock-list": ("nicecli", ["--unlock-list", "{ach}", "{ach2}"], adds_ops(2)),
+    "nicecli --unlock-all": ("nicecli", ["--unlock-all", "-g", "{cc_id}"], adds_ops(2)),
+}
+
+def placeholders(file: str) -> Dict[str, str]:
+    # the registered game with the most locked achievements, two of its locked
+    # normal ones, an unlocked and a secret one, the first pending op and the player
+    conn = sqlite3.connect(file)
+    try:
+        package, game_id, game_name, cc_id = conn.execute(
+            "select gi.package_name, gi.instance_game_id, gi.instance_display_name, cc._id from game_instances gi"
+            " join client_contexts cc on cc.package_name = gi.package_name"
+            " join achievement_definitions ad on ad.game_id = gi.instance_game_id"
+            " join achievement_instances ai on ai.definition_id = ad._id"
+            " where ai.state > 0 group by gi.package_name order by count(*) desc, gi.package_name limit 1").fetchone()
+
+        def ach(where: str) -> List[str]:
+            return [x[0] for x in conn.execute(
+                "select ad.external_achievement_id from achievement_definitions ad"
+                " join achievement_instances ai on ai.definition_id = ad._id"
+                f" where ad.game_id = ? and {where} order by ad._id", [game_id])]
+
+        locked = ach("ai.state > 0 and ad.type = 0")[:2]
+        # the game has none, a listing without it passes
+        unlocked = (ach("ai.state = 0") or [""])[0]
+        secret = (ach("ad.initial_state = 2") or [""])[0]
+        op = conn.execute("select external_achievement_id from achievement_pending_ops order by _id limit 1").fetchone()
+        player = conn.execute("select profile_name from players order by _id limit 1").fetchone()
+        return {"package": package, "game_id": str(game_id), "game_name": game_name, "cc_id": str(cc_id), "ach": locked[0], "ach2": locked[-1],
+                "unlocked": unlocked, "secret": secret, "op": op[0] if op else "", "player": player[0]}
+    finally:
+        conn.close()
+
+def db_state(file: str) -> State:
+    conn = sqlite3.connect(file)
+    try:
+        ops, distinct = conn.execute(
+            "select count(*), count(distinct client_context_id || ':' || external_achievement_id || ':' || coalesce(steps_to_increment, ''))"
+            " from achievement_pending_ops").fetchone()
+        return {"ops": ops, "dups": ops - distinct}
+    finally:
+        conn.close()
+
+def run_command(script: str, argv: List[str]) -> Tuple[List[str], Dict[str, Any], str]:
+    # statements sqlite ran, the --stats summary and the output of one command
+    import gpau
+    import nicecli
+    from gpau_objects.dbfile import DbFile
+    from gpau_objects.gpau import GooglePlayAchievementUnlocker
+
+    statements: List[str] = []
+    out = io.StringIO()
+    DbFile.trace = statements.append
+    try:
+        with contextlib.redirect_stdout(out), contextlib.redirect_stderr(out):
+            if script == "gpau":
+                GooglePlayAchievementUnlocker(gpau.parser.parse_args(argv + ["--stats", "json"])).run()
+            else:
+                nicecli.main(nicecli.parser.parse_args(argv + ["--stats", "json"]))
+    except SystemExit as e:
+        raise RuntimeError(f"{script} {' '.join(argv)} exited with {e.code}:\n{out.getvalue()}")
+    finally:
+        DbFile.trace = None
+
+    lines = out.getvalue().splitlines()
+    summaries = [x for x in lines if x.startswith('{"queries"')]
+    output = "\n".join(x for x in lines if not x.startswith('{"queries"'))
+    return statements, json.loads(summaries[-1]) if summaries else {}, output
+
+def measure(directory: str, only: Optional[List[str]]) -> Tuple[Dict[str, Dict[str, Dict[str, int]]], List[str]]:
+    # the numbers of every command per size and the commands that didn't do their job
+    from gpau_objects.gpau import GooglePlayAchievementUnlocker
+
+    measured: Dict[str, Dict[str, Dict[str, int]]] = {}
+    failures: List[str] = []
+    cache = os.environ["GPAU_CACHE_DIR"]
+    for size, values in SIZES.items():
+        config = gmsdb.Config()
+        config.accounts = 2
+        for name, value in values.items():
+            setattr(config, name, value)
+        accounts = os.path.join(directory, size)
+        source = gmsdb.generate_accounts(accounts, config)[0]
+        GooglePlayAchievementUnlocker.default_db_regex = os.path.join(accounts, "games_*.db")
+        fill = placeholders(source)
+        work = os.path.join(directory, f"{size}_work.db")
+
+        for name, (script, argv, verify) in COMMANDS.items():
+            if only is not None and name not in only:
+                continue
+            shutil.rmtree(cache, ignore_errors=True)
+            shutil.copyfile(source, work)
+            before = db_state(work)
+            statements, summary, output = run_command(script, ["-i", work] + [x.format(**fill) for x in argv])
+            problem = verify(fill, before, db_state(work), output)
+            if problem:
+                failures.append(f"{name} ({size}): {problem}")
+            measured.setdefault(name, {})[size] = {"statements": len(statements), "rows": summary.get("rows", 0)}
+    return measured, failures
+
+def growing(measured: Dict[str, Dict[str, Dict[str, int]]]) -> List[str]:
+    return [x for x, y in measured.items() if y["large"]["statements"] > y["small"]["statements"]]
+
+def check(measured: Dict[str, Dict[str, Dict[str, int]]], budgets: Dict[str, Any]) -> List[str]:
+    failures = []
+    grows = growing(measured)
+    for name, sizes in measured.items():
+        budget = budgets.get(name)
+        if budget is None:
+            failures.append(f"{name}: no budget, add it to {os.path.basename(BUDGETS)} (--update)")
+            continue
+        small, large = sizes["small"], sizes["large"]
+        if large["statements"] > budget["statements"]:
+            failures.append(f"{name}: {large['statements']} statements, budget is {budget['statements']}")
+        if large["rows"] > budget["rows"]:
+            failures.append(f"{name}: fetched {large['rows']} rows, budget is {budget['rows']}")
+        if name in grows and not budget.get("grows"):
+            failures.append(f"{name}: statements grow with the data ({small['statements']} -> {large['statements']}), a query per row?")
+    return failures
+
+def main(argv: Optional[List[str]]=None) -> None:
+    parser = argparse.ArgumentParser(description="Check the query budgets of the CLI actions")
+    parser.add_argument('--only', metavar='names', help='comma separated command names')
+    parser.add_argument('--update', action='store_true', help=f'write the measured numbers to {os.path.basename(BUDGETS)}')
+    parser.add_argument('--allow-growth', metavar='names', help='with --update, comma separated commands whose statements may grow with the data')
+    args = parser.parse_args(argv)
+    only = args.only.split(",") if args.only else None
+    allowed = args.allow_growth.split(",") if args.allow_growth else []
+
+    directory = tempfile.mkdtemp(prefix="gpau_budget_")
+    os.environ["GPAU_CACHE_DIR"] = os.path.join(directory, "cache")
+    try:
+        measured, broken = measure(directory, only)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    with open(BUDGETS) as f:
+        budgets = json.load(f)
+
+    for name, sizes in measured.items():
+        print(f"{name:<30} " + "  ".join(f"{size}: {x['statements']:>4} statements {x['rows']:>6} rows" for size, x in sizes.items()))
+
+    # numbers of a command that didn't do its job mean nothing, they're never written
+    for x in broken:
+        print(f"FAILED {x}")
+    if broken:
+        sys.exit(1)
+
+    if args.update:
+        unknown = [x for x in allowed if x not in COMMANDS]
+        if unknown:
+            Logger.error_exit(f"Unknown commands in --allow-growth: {', '.join(unknown)}")
+        refused = [x for x in growing(measured) if x not in allowed and not budgets.get(x, {}).get("grows")]
+        for x in refused:
+            sizes = measured[x]
+            print(f"NOT UPDATED {x}: statements grow with the data ({sizes['small']['statements']} -> {sizes['large']['statements']}), pass --allow-growth if that's intended")
+        if refused:
+            sys.exit(1)
+
+        for name, sizes in measured.items():
+            budget = budgets.setdefault(name, {})
+            budget.update({"statements": sizes["large"]["statements"], "rows": sizes["large"]["rows"],
+                           "grows": bool(budget.get("grows")) or name in allowed})
+        with open(BUDGETS, "w") as f:
+            json.dump(budgets, f, indent=1, sort_keys=True)
+            f.write("\n")
+        return
+
+    failures = check(measured, budgets)
+    for x in failures:
+        print(f"OVER BUDGET {x}")
+    if failures:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,34 @@
+# Decoding achievement_instances rows into objects, the positional get_arg
+# constructor it replaced (benchmarks/legacy.py) vs the generated by-name decoder
+# DbFile uses.
+#   python -m benchmarks.decode [rows] [repeat]
+import sys
+import time
+from gpau_objects.structure import AchievementInstance
+from gpau_objects.dbfile import DbFile
+from benchmarks import legacy
+from benchmarks.gmsdb import instances_db
+
+def best(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def main(argv):
+    rows = int(argv[0]) if len(argv) > 0 else 20000
+    repeat = int(argv[1]) if len(argv) > 1 else 5
+    db = DbFile(instances_db(rows))
+    data = db.cur.execute("select * from achievement_instances order by _id").fetchall()
+    decode = db.decoder(AchievementInstance)
+
+    assert legacy.AchievementInstance(*data[0]).dict() == decode(data[0]).dict()
+    positional = best(lambda: [legacy.AchievementInstance(*x) for x in data], repeat)
+    by_name = best(lambda: list(map(decode, data)), repeat)
+    print(f"positional: {positional * 1000:.2f} ms ({rows} rows)")
+    print(f"   by name: {by_name * 1000:.2f} ms ({rows} rows, {positional / by_name:.1f}x)")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,231 @@
+# Builds synthetic GMS games_*.db files with every table of DbFile.mapping, so the
+# tool can be measured without a rooted phone. The data is seeded, the same
+# arguments always give the same databases.
+#   python -m benchmarks.gmsdb out_dir [--games 500] [--achs 30] [--accounts 3] ...
+import os
+import sys
+import random
+import sqlite3
+import argparse
+import gpau_objects.structure
+from gpau_objects.dbfile import DbFile
+from typing import Any, Dict, List, Optional
+
+TEXT_COLUMNS = {
+    "external_game_id", "display_name", "primary_category", "secondary_category",
+    "developer_name", "game_description", "screenshot_image_ids", "screenshot_image_widths",
+    "screenshot_image_heights", "video_url", "sync_token", "formatted_price",
+    "formatted_full_price", "explanation", "description_snippet", "theme_color",
+    "external_achievement_id", "name", "description", "formatted_total_steps",
+    "formatted_current_steps", "package_name", "account_name", "account_type",
+    "instance_display_name", "external_player_id", "profile_name", "player_title",
+    "most_recent_external_game_id", "most_recent_game_name", "gamer_tag", "real_name",
+    "play_together_nickname", "play_together_invitation_nickname", "url",
+    "steps_to_increment", "min_steps_to_set", "game_player_ids_external_player_id",
+    "game_player_ids_external_game_id", "game_player_ids_external_game_player_id",
+    "game_player_ids_external_primary_player_id",
+}
+REAL_COLUMNS = {"rarity_percent", "starRating"}
+
+# the columns gpau looks rows up by, --no-indexes measures without them
+INDEXES = {
+    "achievement_definitions": ["game_id", "external_achievement_id"],
+    "achievement_instances": ["definition_id"],
+    "game_instances": ["instance_game_id", "package_name"],
+    "client_contexts": ["package_name"],
+    "games": ["external_game_id"],
+    "achievement_pending_ops": ["external_achievement_id"],
+}
+
+ADJECTIVES = ["Plague", "Rebel", "Grim", "Space", "Crystal", "Shadow", "Iron", "Tiny", "Super", "Ancient",
+              "Lost", "Wild", "Neon", "Frozen", "Royal", "Silent", "Cosmic", "Hidden", "Brave", "Savage"]
+NOUNS = ["Inc", "Valor", "Mafia", "Kingdom", "Racer", "Quest", "Tower", "Legends", "Farm", "Empire",
+         "Dungeon", "Island", "Soldier", "Puzzle", "Galaxy", "Tactics", "Chef", "Knight", "Heist", "Arena"]
+VERBS = ["Win", "Beat", "Collect", "Complete", "Unlock", "Defeat", "Reach", "Build", "Find", "Survive"]
+THINGS = ["levels", "bosses", "coins", "stars", "missions", "gems", "rounds", "worlds", "friends", "chests"]
+
+class Config:
+    seed        : int   = 1
+    games       : int   = 500
+    achs        : int   = 30     # per game
+    unlocked    : float = 0.4
+    incremental : float = 0.2
+    secret      : float = 0.1
+    installed   : float = 0.9
+    in_cc       : float = 0.7
+    ops         : int   = 200    # pending ops per account
+    dup_ops     : float = 0.3    # share of the ops that repeat an earlier one
+    accounts    : int   = 3
+    indexes     : bool  = True
+
+def column_type(col: str) -> str:
+    if col == "_id":
+        return "INTEGER PRIMARY KEY AUTOINCREMENT"
+    if col in TEXT_COLUMNS:
+        return "TEXT"
+    if col in REAL_COLUMNS:
+        return "REAL"
+    return "INTEGER"
+
+def create_schema(conn: sqlite3.Connection, indexes: bool) -> None:
+    for table, cls in DbFile.mapping.items():
+        conn.execute(f"create table {table} ({', '.join(f'{x} {column_type(x)}' for x in cls.fields())})")
+    if indexes:
+        for table, cols in INDEXES.items():
+            for col in cols:
+                conn.execute(f"create index {table}_{col}_index on {table} ({col})")
+
+def insert(conn: sqlite3.Connection, cls: type, rows: List[Dict[str, Any]]) -> None:
+    # columns not given are null, like GMS leaves most of them
+    cols = cls.fields()
+    table = [x for x, y in DbFile.mapping.items() if y is cls][0]
+    conn.executemany(
+        f"insert into {table} ({','.join(cols)}) values ({','.join('?' for _ in cols)})",
+        [[x.get(c) for c in cols] for x in rows])
+
+def generate(path: str, config: Config, account: int=1) -> str:
+    r = random.Random(config.seed * 1000 + account)
+    if os.path.exists(path):
+        os.remove(path)
+
+    conn = sqlite3.connect(path)
+    create_schema(conn, config.indexes)
+
+    player_id = str(110000000000000000000 + config.seed * 1000 + account)
+    insert(conn, gpau_objects.structure.Player, [{
+        "_id": 1, "external_player_id": player_id, "profile_name": f"Player{account}",
+        "current_level": r.randint(1, 100), "current_xp_total": r.randint(0, 10 ** 6),
+    }])
+
+    games, instances, contexts, player_ids, images = [], [], [], [], []
+    definitions, ach_instances = [], []
+    for g in range(1, config.games + 1):
+        name = f"{r.choice(ADJECTIVES)} {r.choice(NOUNS)}" + (f" {g}" if g > 40 else "")
+        developer = f"{r.choice(ADJECTIVES)} Studios"
+        package = f"com.{developer.split()[0].lower()}.{name.lower().replace(' ', '')}"
+        external_game_id = str(100000000000 + g)
+
+        images.append({"_id": g, "url": f"https://example.com/icon/{g}.png", "local": 0, "filesize": 4096})
+        games.append({
+            "_id": g, "external_game_id": external_game_id, "display_name": name,
+            "primary_category": "GAME", "developer_name": developer,
+            "game_description": f"{name} by {developer}. " * 8, "game_icon_image_id": g,
+            "achievement_total_count": config.achs, "play_enabled_game": 1,
+        })
+        installed = r.random() < config.installed
+        instances.append({
+            "_id": g, "instance_game_id": g, "package_name": package, "platform_type": 2,
+            "installed": 1 if installed else 0, "instance_display_name": name,
+        })
+        if installed and r.random() < config.in_cc:
+            contexts.append({
+                "_id": len(contexts) + 1, "package_name": package, "package_uid": 10000 + g,
+                "account_name": f"player{account}@gmail.com", "account_type": "com.google", "is_games_lite": 0,
+            })
+        player_ids.append({
+            "_id": g, "game_player_ids_external_player_id": player_id,
+            "game_player_ids_external_game_id": external_game_id,
+            "game_player_ids_external_game_player_id": f"g{g:012d}{account}",
+        })
+
+        for _ in range(config.achs):
+            a = len(definitions) + 1
+            incremental = r.random() < config.incremental
+            secret = r.random() < config.secret
+            unlocked = r.random() < config.unlocked
+            total = r.choice([5, 10, 25, 100]) if incremental else None
+            steps = (total if unlocked else r.randrange(total)) if incremental else 0
+            thing = r.choice(THINGS)
+            definitions.append({
+                "_id": a, "game_id": g, "external_achievement_id": f"CgkI{g:06d}EAIQ{a:06d}",
+                "type": 1 if incremental else 0,
+                "name": f"{r.choice(VERBS)} {r.randint(1, 500)} {thing}",
+                "description": f"{r.choice(VERBS)} {thing} in {name}",
+                "total_steps": total, "formatted_total_steps": None if total is None else str(total),
+                "initial_state": 2 if secret else 1, "sorting_rank": a, "definition_xp_value": r.choice([500, 1000, 5000]),
+                "rarity_percent": round(r.random() * 100, 1),
+            })
+            ach_instances.append({
+                "_id": a, "definition_id": a, "player_id": 1,
+                "state": 0 if unlocked else (2 if secret else 1),
+                "current_steps": steps, "formatted_current_steps": str(steps) if incremental else None,
+                "last_updated_timestamp": 1600000000000 + a * 1000, "instance_xp_value": 1000,
+            })
+
+    ops: List[Dict[str, Any]] = []
+    contexts_by_package = {x["package_name"]: x["_id"] for x in contexts}
+    candidates = [x for x, y in zip(definitions, ach_instances)
+                  if y["state"] != 0 and instances[x["game_id"] - 1]["package_name"] in contexts_by_package]
+    for i in range(config.ops if candidates else 0):
+        if ops and r.random() < config.dup_ops:
+            op = dict(r.choice(ops))
+        else:
+            d = r.choice(candidates)
+            op = {
+                "client_context_id": contexts_by_package[instances[d["game_id"] - 1]["package_name"]],
+                "external_achievement_id": d["external_achievement_id"], "achievement_type": d["type"],
+                "new_state": 0, "steps_to_increment": str(r.randint(1, 5)) if d["type"] == 1 else "",
+                "min_steps_to_set": "", "external_game_id": games[d["game_id"] - 1]["external_game_id"],
+                "external_player_id": player_id,
+            }
+        op["_id"] = i
+        ops.append(op)
+
+    insert(conn, gpau_objects.structure.Image, images)
+    insert(conn, gpau_objects.structure.Game, games)
+    insert(conn, gpau_objects.structure.GameInstance, instances)
+    insert(conn, gpau_objects.structure.ClientContext, contexts)
+    insert(conn, gpau_objects.structure.GamePlayerId, player_ids)
+    insert(conn, gpau_objects.structure.AchievementDefinition, definitions)
+    insert(conn, gpau_objects.structure.AchievementInstance, ach_instances)
+    insert(conn, gpau_objects.structure.AchievementPendingOp, ops)
+    conn.commit()
+    conn.close()
+    return path
+
+def instances_db(rows: int) -> sqlite3.Connection:
+    # an in-memory achievement_instances table alone, for the decode/memory micro benchmarks
+    conn = sqlite3.connect(":memory:")
+    cols = gpau_objects.structure.AchievementInstance.fields()
+    conn.execute(f"create table achievement_instances ({', '.join(f'{x} {column_type(x)}' for x in cols)})")
+    conn.executemany(
+        f"insert into achievement_instances values ({','.join('?' for _ in cols)})",
+        [[i, i, 1, i % 2, i % 10, str(i % 10), 1600000000000 + i, 100] for i in range(1, rows + 1)])
+    conn.commit()
+    return conn
+
+def generate_accounts(directory: str, config: Config) -> List[str]:
+    os.makedirs(directory, exist_ok=True)
+    return [generate(os.path.join(directory, f"games_{config.seed:04x}{x:04x}.db"), config, x)
+            for x in range(1, config.accounts + 1)]
+
+def config_from(args: Any) -> Config:
+    config = Config()
+    for name in [x for x in vars(Config) if not x.startswith("_")]:
+        value = getattr(args, name, None)
+        if value is not None:
+            setattr(config, name, value)
+    return config
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument('--seed', type=int, help=f'default: {Config.seed}')
+    parser.add_argument('--games', type=int, help=f'default: {Config.games}')
+    parser.add_argument('--achs', type=int, help=f'achievements per game, default: {Config.achs}')
+    parser.add_argument('--unlocked', type=float, help=f'unlocked share, default: {Config.unlocked}')
+    parser.add_argument('--incremental', type=float, help=f'incremental share, default: {Config.incremental}')
+    parser.add_argument('--secret', type=float, help=f'secret share, default: {Config.secret}')
+    parser.add_argument('--ops', type=int, help=f'pending ops per account, default: {Config.ops}')
+    parser.add_argument('--dup-ops', dest='dup_ops', type=float, help=f'share of duplicated ops, default: {Config.dup_ops}')
+    parser.add_argument('--accounts', type=int, help=f'account db files, default: {Config.accounts}')
+    parser.add_argument('--no-indexes', dest='indexes', action='store_false', default=None, help='no indexes on the lookup columns')
+
+def main(argv: Optional[List[str]]=None) -> None:
+    parser = argparse.ArgumentParser(description="Generate synthetic GMS games_*.db files")
+    parser.add_argument('directory')
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+    for path in generate_accounts(args.directory, config_from(args)):
+        print(path)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,53 @@
+# A frozen copy of the record classes as they were before the __slots__/decoder
+# rework (the baseline commit of gpau_objects/structure.py), so the benchmarks
+# compare against the code that was replaced. Don't change them.
+from __future__ import annotations
+from datetime import datetime
+from typing import List, Any, Optional, Dict, Callable
+
+class Wrapper:
+    _id: Optional[int] = None
+    _changers: Dict[str, Callable] = {}
+    _args: List[Any] = []
+
+    _hidden_attrs: List[str] = [
+        "_changers",
+        "_args",
+        "_hidden_attrs"
+    ]
+
+    def __init__(self, *args) -> None:
+        self._args = args
+
+    def attrs(self) -> List[str]:
+        return [x for x in self.__dict__ if not x.startswith("__") and not x.endswith("__") and x not in self._hidden_attrs]
+
+    def values(self) -> List[Any]:
+        return [getattr(self, x) for x in self.attrs()]
+
+    def dict(self) -> Dict[str, Any]:
+        return {x: getattr(self, x) for x in self.attrs()}
+
+    def get_arg(self, index: int, lst: List[Any]) -> Any:
+        return lst[index] if index < len(lst) else None
+
+    @property
+    def id(self) -> Optional[int]:
+        return self._id
+
+class AchievementInstance(Wrapper):
+    def __init__(self, *args) -> None:
+        super().__init__(*args)
+
+        self._changers = {
+            "last_updated_timestamp": lambda x: datetime.fromtimestamp(x / 1000)
+        }
+
+        self._id = self.get_arg(0, args)
+        self.definition_id = self.get_arg(1, args)
+        self.player_id = self.get_arg(2, args)
+        self.state = self.get_arg(3, args)
+        self.current_steps = self.get_arg(4, args)
+        self.formatted_current_steps = self.get_arg(5, args)
+        self.last_updated_timestamp = self.get_arg(6, args)
+        self.instance_xp_value = self.get_arg(7, args)
@@ -0,0 +1,51 @@
+# Per-lookup latency of Finder style point lookups, spliced SQL vs bound parameters.
+#   python -m benchmarks.lookup [rows] [lookups]
+import sys
+import time
+import sqlite3
+from gpau_objects.structure import AchievementDefinition
+from gpau_objects.dbfile import DbFile
+from gpau_objects import query
+
+def build(rows: int) -> sqlite3.Connection:
+    conn = sqlite3.connect(":memory:", cached_statements=query.STATEMENT_CACHE_SIZE)
+    cols = AchievementDefinition().attrs()
+    conn.execute("create table achievement_definitions ({})".format(
+        ", ".join("_id integer primary key" if c == "_id" else c for c in cols)))
+    conn.execute("create index ach_def_ext on achievement_definitions (external_achievement_id)")
+    conn.executemany(
+        "insert into achievement_definitions values ({})".format(",".join("?" for _ in cols)),
+        [[i, i % 50, f"CgkI{i:08d}", i % 2, f"Achievement {i}", f"Description {i}", 0, 0, 10, "10", 1, i, 100, 1.0]
+         for i in range(1, rows + 1)])
+    conn.commit()
+    return conn
+
+def spliced(db: DbFile, value: str):
+    # the lookup as DbFile.select built it before statements were parameterized
+    sql = f"select * from achievement_definitions where 1=1 and external_achievement_id='{value}' order by _id"
+    res = [AchievementDefinition(*x) for x in db.cur.execute(sql).fetchall()]
+    return res[0] if res else None
+
+def bound(db: DbFile, value: str):
+    return db.select_by_cls_fe(AchievementDefinition, ["external_achievement_id"], [value])
+
+def measure(fn, db: DbFile, values) -> float:
+    start = time.perf_counter()
+    for v in values:
+        fn(db, v)
+    return (time.perf_counter() - start) / len(values) * 1e6
+
+def main(argv):
+    rows = int(argv[0]) if len(argv) > 0 else 20000
+    lookups = int(argv[1]) if len(argv) > 1 else 20000
+    db = DbFile(build(rows))
+    values = [f"CgkI{(i * 7919) % rows + 1:08d}" for i in range(lookups)]
+
+    assert spliced(db, values[0]).dict() == bound(db, values[0]).dict()
+    for name, fn in (("spliced", spliced), ("bound", bound)):
+        measure(fn, db, values[:100])
+        print(f"{name:>8}: {measure(fn, db, values):.2f} us/lookup ({lookups} lookups, {rows} rows)")
+    print(f"shapes: {query.cache_info()['select']}")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
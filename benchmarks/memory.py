@@ -0,0 +1,48 @@
+# Memory held by decoded achievement_instances objects and the cost of
+# attrs/values/dict, the __slots__ records next to the records they replaced
+# (benchmarks/legacy.py).
+#   python -m benchmarks.memory [rows]
+import sys
+import time
+import tracemalloc
+from gpau_objects.structure import AchievementInstance
+from gpau_objects.dbfile import DbFile
+from benchmarks import legacy
+from benchmarks.gmsdb import instances_db
+from typing import Any, Callable, List, Tuple
+
+def traced(fn: Callable[[], List[Any]]) -> Tuple[List[Any], int]:
+    # the row tuples are already in memory, only the objects are measured
+    tracemalloc.start()
+    objs = fn()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return objs, size
+
+def per_call(objs: List[Any], name: str) -> float:
+    start = time.perf_counter()
+    for obj in objs:
+        getattr(obj, name)()
+    return (time.perf_counter() - start) / len(objs) * 1e9
+
+def main(argv):
+    rows = int(argv[0]) if len(argv) > 0 else 100000
+    db = DbFile(instances_db(rows))
+    data = db.cur.execute("select * from achievement_instances order by _id").fetchall()
+    decode = db.decoder(AchievementInstance)
+
+    old, old_size = traced(lambda: [legacy.AchievementInstance(*x) for x in data])
+    assert old[0].dict() == decode(data[0]).dict()
+    del old
+    slots, slots_size = traced(lambda: list(map(decode, data)))
+    old = [legacy.AchievementInstance(*x) for x in data]
+
+    print(f"{'':>9} {'before':>12} {'__slots__':>12}")
+    print(f"{'B/object':>9} {old_size / rows:>12.0f} {slots_size / rows:>12.0f}"
+          f"  ({(1 - slots_size / old_size) * 100:.0f}% less, {rows} rows)")
+    for name in ("attrs", "values", "dict"):
+        before, after = per_call(old, name), per_call(slots, name)
+        print(f"{name:>9} {before:>9.0f} ns {after:>9.0f} ns  ({before / after:.1f}x)")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,250 @@
+# Times the main paths of gpau.py and nicecli.py on synthetic dbs from
+# benchmarks/gmsdb.py and prints the results as one JSON object. Keep the output
+# of a commit and compare a later run against it with --compare.
+# The start up of --help/--readme is measured with -X importtime. The modules it
+# must not load are a hard gate, the import time over a bare `python -c pass`
+# (site, encodings, ...) has a budget (--import-budget), relative so a slow
+# device doesn't fail on the interpreter's own start up.
+#   python -m benchmarks.suite [--games 500] [--achs 30] [--accounts 3] [--repeat 5] [--out file] [--compare old.json]
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import sqlite3
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+import contextlib
+from benchmarks import gmsdb
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# (name, setup, run), setup runs untimed before every run
+Case = Tuple[str, Optional[Callable[[], None]], Callable[[], None]]
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# the interpreter's own start up, the import budget is relative to it
+BASELINE = ["-c", "pass"]
+# commands that need no db, their start up is only imports
+IMPORT_CASES = {
+    "import_gpau_help": ["gpau.py", "--help"],
+    "import_gpau_readme": ["gpau.py", "--readme"],
+    "import_nicecli_help": ["nicecli.py", "--help"],
+}
+# loaded by the real commands only, none of them belongs on the no-db paths
+HEAVY_MODULES = ["sqlite3", "gpau_objects.dbfile", "gpau_objects.gpau", "terminaltables",
+                 "concurrent.futures", "urllib.parse", "inspect", "cProfile", "tracemalloc", "pickle"]
+
+def quiet(fn: Callable[[], None]) -> Callable[[], None]:
+    def run() -> None:
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            try:
+                fn()
+            except SystemExit as e:
+                # error_exit, the numbers of a failed command mean nothing
+                raise RuntimeError(f"command exited with {e.code}")
+    return run
+
+def gpau_command(argv: List[str]) -> Callable[[], None]:
+    import gpau
+    from gpau_objects.gpau import GooglePlayAchievementUnlocker
+    return quiet(lambda: GooglePlayAchievementUnlocker(gpau.parser.parse_args(argv)).run())
+
+def nicecli_command(argv: List[str]) -> Callable[[], None]:
+    import nicecli
+    return quiet(lambda: nicecli.main(nicecli.parser.parse_args(argv)))
+
+def copy_to(source: str, target: str) -> Callable[[], None]:
+    def setup() -> None:
+        for suffix in ("", "-wal", "-shm", "-journal"):
+            if os.path.exists(target + suffix):
+                os.remove(target + suffix)
+        shutil.copyfile(source, target)
+    return setup
+
+def unlock_package(file: str) -> str:
+    # the registered game with the most locked achievements
+    conn = sqlite3.connect(file)
+    try:
+        return conn.execute(
+            "select gi.package_name from game_instances gi"
+            " join client_contexts cc on cc.package_name = gi.package_name"
+            " join achievement_definitions ad on ad.game_id = gi.instance_game_id"
+            " join achievement_instances ai on ai.definition_id = ad._id"
+            " where ai.state > 0 group by gi.package_name order by count(*) desc, gi.package_name limit 1").fetchone()[0]
+    finally:
+        conn.close()
+
+def cases(directory: str, files: List[str]) -> List[Case]:
+    from gpau_objects.gpau import GooglePlayAchievementUnlocker
+    from gpau_objects.structure import Dummy
+
+    db = files[0]
+    work = os.path.join(directory, "work.db")
+    manifest = os.path.join(directory, "cache", "players.json")
+    package = unlock_package(db)
+
+    def get_players() -> None:
+        dummy = Dummy()
+        dummy.input = db
+        players = GooglePlayAchievementUnlocker(dummy).get_players()
+        if len(players) != len(files):
+            raise RuntimeError(f"found {len(players)} of {len(files)} players")
+
+    def no_manifest() -> None:
+        if os.path.exists(manifest):
+            os.remove(manifest)
+
+    return [
+        ("list_games", None, gpau_command(["-i", db, "--list-games"])),
+        ("all_games_n", None, nicecli_command(["-i", db, "--all-games-n"])),
+        ("search_achs", None, gpau_command(["-i", db, "--search-achs", "Collect"])),
+        ("unlock_all", copy_to(db, work), gpau_command(["-i", work, "-a", package, "--unlock-all", "--auto-inc-achs"])),
+        ("rem_dup_ops", copy_to(db, work), gpau_command(["-i", work, "--rem-dup-ops"])),
+        ("get_players_cold", no_manifest, quiet(get_players)),
+        ("get_players_warm", None, quiet(get_players)),
+    ]
+
+def measure(setup: Optional[Callable[[], None]], run: Callable[[], None], repeat: int) -> Dict[str, Any]:
+    # the first run pays for building the sidecar indexes and caches, kept apart
+    times = []
+    for _ in range(repeat + 1):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    return {"first": times[0], "min": min(times[1:]), "median": statistics.median(times[1:]), "runs": times[1:]}
+
+def import_time(argv: List[str]) -> Tuple[float, List[str]]:
+    # seconds of the top level imports and every module imported
+    out = subprocess.run([sys.executable, "-X", "importtime"] + argv, capture_output=True, text=True, cwd=ROOT)
+    total, modules = 0, []
+    for line in out.stderr.splitlines():
+        parts = line.split("|")
+        if not line.startswith("import time:") or len(parts) != 3 or not parts[0].split(":")[1].strip().isdigit():
+            continue
+        name = parts[2][1:]
+        modules.append(name.strip())
+        if not name.startswith(" "):
+            total += int(parts[1])
+    return total / 1e6, modules
+
+def measure_imports(argv: List[str], repeat: int, baseline: float=0.0) -> Dict[str, Any]:
+    # the first run may still compile the .pyc files, "own" is the median over the baseline
+    times, modules = [], []
+    for _ in range(repeat + 1):
+        elapsed, modules = import_time(argv)
+        times.append(elapsed)
+    heavy = [x for x in HEAVY_MODULES if x in modules]
+    median = statistics.median(times[1:])
+    return {"first": times[0], "min": min(times[1:]), "median": median, "runs": times[1:],
+            "own": max(0.0, median - baseline), "heavy": heavy}
+
+def check_imports(results: Dict[str, Any], budget: float) -> List[str]:
+    # budget is the import time a command may add to the interpreter's start up, times the baseline
+    failures = []
+    baseline = results.get("import_baseline")
+    for name in IMPORT_CASES:
+        result = results.get(name)
+        if result is None:
+            continue
+        if baseline is not None and result["own"] > budget * baseline["median"]:
+            failures.append(f"{name}: imports add {result['own'] * 1000:.1f}ms to the {baseline['median'] * 1000:.1f}ms"
+                            f" of a bare interpreter, budget is {budget:.1f}x")
+        if result["heavy"]:
+            failures.append(f"{name}: imports {', '.join(result['heavy'])}")
+    return failures
+
+def git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=ROOT)
+        return out.stdout.strip() or None
+    except OSError:
+        return None
+
+def compare(old: Dict[str, Any], new: Dict[str, Any], threshold: float) -> bool:
+    # True when no case got slower than threshold times its old median
+    ok = True
+    print(f"{'case':<20} {'old':>10} {'new':>10} {'ratio':>7}")
+    for name, result in new["results"].items():
+        before = old.get("results", {}).get(name)
+        if before is None:
+            print(f"{name:<20} {'-':>10} {result['median'] * 1000:>8.2f}ms")
+            continue
+        ratio = result["median"] / before["median"] if before["median"] else float("inf")
+        slower = ratio > threshold
+        ok = ok and not slower
+        print(f"{name:<20} {before['median'] * 1000:>8.2f}ms {result['median'] * 1000:>8.2f}ms {ratio:>6.2f}x" + ("  SLOWER" if slower else ""))
+    return ok
+
+def main(argv: Optional[List[str]]=None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark gpau on synthetic GMS dbs")
+    gmsdb.add_arguments(parser)
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs per case, default: 5')
+    parser.add_argument('--only', metavar='cases', help='comma separated case names')
+    parser.add_argument('--dir', help='keep the generated dbs here instead of a temp dir')
+    parser.add_argument('--out', help='write the JSON here instead of stdout')
+    parser.add_argument('--compare', metavar='file', help='compare the medians with an earlier --out')
+    parser.add_argument('--threshold', type=float, default=1.2, help='slowdown ratio --compare fails on, default: 1.2')
+    parser.add_argument('--import-budget', type=float, default=6.0, metavar='ratio', help='import time the no-db commands may add, in bare interpreter start ups, default: 6.0')
+    args = parser.parse_args(argv)
+
+    config = gmsdb.config_from(args)
+    directory = args.dir or tempfile.mkdtemp(prefix="gpau_bench_")
+    # the caches must not leak in from (or into) the real cache dir
+    os.environ["GPAU_CACHE_DIR"] = os.path.join(directory, "cache")
+    shutil.rmtree(os.environ["GPAU_CACHE_DIR"], ignore_errors=True)
+
+    from gpau_objects.gpau import GooglePlayAchievementUnlocker
+    files = gmsdb.generate_accounts(os.path.join(directory, "accounts"), config)
+    GooglePlayAchievementUnlocker.default_db_regex = os.path.join(directory, "accounts", "games_*.db")
+
+    only = args.only.split(",") if args.only else None
+    results: Dict[str, Any] = {}
+    try:
+        for name, setup, run in cases(directory, files):
+            if only is None or name in only:
+                results[name] = measure(setup, run, args.repeat)
+        imports = [x for x in IMPORT_CASES if only is None or x in only]
+        if imports:
+            results["import_baseline"] = measure_imports(BASELINE, args.repeat)
+        for name in imports:
+            results[name] = measure_imports(IMPORT_CASES[name], args.repeat, results["import_baseline"]["median"])
+    finally:
+        if not args.dir:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "config": {x: getattr(config, x) for x in vars(gmsdb.Config) if not x.startswith("_")},
+        "repeat": args.repeat,
+        "results": results,
+    }
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=1)
+    else:
+        print(json.dumps(report))
+
+    failures = check_imports(results, args.import_budget)
+    for x in failures:
+        print(f"OVER BUDGET {x}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare) as f:
+            old = json.load(f)
+        if not compare(old, report, args.threshold):
+            sys.exit(1)
+    if failures:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
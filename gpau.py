@@ -1,9 +1,12 @@
 import sys
 import argparse
+from gpau_objects.common import Logger, default_socket
 from gpau_objects.structure import Dummy
-from gpau_objects.gpau import GooglePlayAchievementUnlocker
 from typing import Union
 
+# the db, server, batch and profiling modules are imported by main() when the
+# command needs them, --help and --readme start without them
+
 DEBUG = False
 
 args: Union[argparse.Namespace, Dummy] = Dummy()
@@ -14,12 +17,23 @@ if not DEBUG:
     parser.add_argument('--readme', dest='readme', action='store_true', help='How to use this?')
     parser.add_argument('--auto-inc-achs', dest='auto_inc_achs', action='store_true', help='Automatically set the incremental achievements to max')
     parser.add_argument('--rem-dup-ops', dest='rem_dup_ops', action='store_true', help='Remove duplicate achievement pending ops')
+    parser.add_argument('--dup-key', dest='dup_key', metavar='cols', help='Columns that make ops duplicates for --rem-dup-ops, comma separated, default: external_achievement_id')
     parser.add_argument('--rem-all-ops', dest='rem_all_ops', action='store_true', help='Remove all achievement pending ops')
+    parser.add_argument('--compact-ops', dest='compact_ops', action='store_true', help='Merge pending ops of the same achievement into one (summing incremental steps) and drop ops of unlocked achievements')
+    parser.add_argument('--preload', dest='preload', action='store_true', help='Load the whole database into memory first, faster for big listings')
+    parser.add_argument('--snapshot', dest='snapshot', action='store_true', help='Read from an in-memory copy of the database, never holds a lock on it')
+    parser.add_argument('--cache-info', dest='cache_info', action='store_true', help='Show hits/misses of the lookup cache at the end')
+    parser.add_argument('--stats', dest='stats', nargs='?', const='text', choices=['text', 'json'], help='Show query counts, timings, slow query plans and full scans at the end')
+    parser.add_argument('--profile', dest='profile', metavar='file', nargs='?', const='gpau.pstats', help='Profile the command with cProfile and tracemalloc, writes file (default: gpau.pstats) and shows the top functions, allocations and phases')
+    parser.add_argument('--serve', dest='serve', metavar='socket', nargs='?', const=default_socket(), help='keep running and take commands from gpauc.py over a unix socket')
+    parser.add_argument('--batch', dest='batch', metavar='file', help='run the commands in file (one per line, - for stdin) in one session')
+    parser.add_argument('--batch-tx', dest='batch_tx', choices=['batch', 'command'], default='batch', help='one write transaction for the whole --batch or one per command, default: batch')
     package_group = parser.add_mutually_exclusive_group()
     package_group.add_argument('-a', dest='app', metavar='app_name', help='app name')
     package_group.add_argument('-aid', dest='app_id', metavar='app_id', help='app id')
     player_group = parser.add_mutually_exclusive_group()
     player_group.add_argument('-p', dest='player', metavar='#', help='player # in --list-players')
+    player_group.add_argument('--all-players', dest='all_players', action='store_true', help='run the command for every player (db file) at once')
     list_group = parser.add_mutually_exclusive_group()
     list_group.add_argument('--list-cc', action='store_true', help='list all client contexts')
     list_group.add_argument('--list-games', action='store_true', help='list all games')
@@ -33,6 +47,7 @@ if not DEBUG:
     package_list_group.add_argument('--list-inc-achs', action='store_true', help='list all incremental achievements')
     package_list_group.add_argument('--list-sec-achs', action='store_true', help='list all secret achievements')
     search_group = parser.add_argument_group()
+    search_group.add_argument('--fuzzy', dest='fuzzy', action='store_true', help='typo tolerant search, best matches first')
     search_group.add_argument('--search-games', metavar='search', type=str, help='search for a game by input')
     search_group.add_argument('--search-achs', metavar='search', type=str, help='search for an achievements by input')
     search_group.add_argument('--search-u-achs', metavar='search', type=str, help='search for unlocked achievements by input')
@@ -44,7 +59,6 @@ if not DEBUG:
     unlock_group.add_argument('--unlock-id', dest='unlock_id', metavar='external_id', type=str, help='unlocks an achievement by its external id')
     unlock_group.add_argument('--unlock-all', dest='unlock_all', action='store_true', help='unlocks all achievements in given package')
     unlock_group.add_argument('--unlock-listed', dest='unlock_listed', action='store_true', help='unlocks all listed achievements')
-    args = parser.parse_args()
 else:
     args.input = "dbs\\games_2db19fbf.db"
     # args.secure_mode = True
@@ -75,10 +89,33 @@ else:
     # args.app = "com.direlight.grimvalor"
     # args.app = "com.paradoxplaza.kopp2"
 
+def main(args):
+    if args.readme:
+        from gpau_objects.readme import readme_text
+        Logger.error_exit(readme_text)
+
+    if args.serve:
+        from gpau_objects.server import Server
+        Server(args.serve, parser, args).serve_forever()
+    elif args.batch:
+        from gpau_objects.batch import run_batch
+        run_batch(parser, args)
+    else:
+        from gpau_objects.gpau import GooglePlayAchievementUnlocker
+        if args.all_players:
+            GooglePlayAchievementUnlocker.run_all_players(args)
+        else:
+            GooglePlayAchievementUnlocker(args).run()
+
 if __name__ == "__main__":
     if not DEBUG:
         if len(sys.argv[1:]) == 0:
             parser.print_help()
             exit(1)
+        args = parser.parse_args()
 
-    GooglePlayAchievementUnlocker(args).run()
+    if args.profile:
+        from gpau_objects.profiling import Profile
+        Profile(args.profile).run(main, args)
+    else:
+        main(args)
@@ -0,0 +1,36 @@
+import os
+from gpau_objects.common import Logger
+from gpau_objects.players import find_players
+from typing import Any, Callable, List, Tuple
+
+# Runs one piece of work per account db on a thread pool. Every worker opens its
+# own connection (sqlite connections can't be shared between threads) and
+# sqlite releases the GIL while it reads, so the accounts are scanned side by
+# side and the wall time follows the slowest account.
+
+max_workers = 8
+
+def account_labels(files: List[str]) -> List[str]:
+    players = find_players(files)
+    return [players[x].profile_name if x in players and players[x].profile_name else os.path.basename(x) for x in files]
+
+def for_each_account(files: List[str], work: Callable[[str], Any]) -> List[Tuple[str, str, Any]]:
+    # (file, account label, result) in the order of files, result is None when the work failed
+    def guarded(file: str) -> Any:
+        try:
+            return work(file)
+        except (Exception, SystemExit) as e:
+            # Logger.error_exit has already said why, anything else gets its message here
+            reason = "skipped" if isinstance(e, SystemExit) else str(e)
+            Logger.warning(f"{os.path.basename(file)}: {reason}")
+            return None
+
+    if not files:
+        return []
+
+    labels = account_labels(files)
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(files))) as pool:
+        results = list(pool.map(guarded, files))
+
+    return list(zip(files, labels, results))
@@ -0,0 +1,83 @@
+import sys
+import time
+import shlex
+import argparse
+import contextlib
+from gpau_objects.common import Logger
+from gpau_objects.gpau import GooglePlayAchievementUnlocker
+from typing import Any, List, Optional, Tuple
+
+# Runs a list of gpau.py command lines in one session: one connection, one set
+# of Finder caches and one resolved player. The file has one command per line,
+# blank lines and lines starting with # are skipped, e.g.
+#   --rem-all-ops
+#   --unlock-all -a com.miniclip.plagueinc --auto-inc-achs
+#   --rem-dup-ops
+#   --list-ops
+# Writes are grouped in one transaction for the whole batch (--batch-tx batch,
+# all or nothing) or one per writing command (--batch-tx command), the read-only
+# commands in between don't hold the write lock. The batch stops at the first
+# failing command.
+
+# the account and load options belong to the --batch command line itself
+session_options = ["serve", "batch", "all_players", "input", "player", "profile"]
+
+def read_batch(file: str) -> List[List[str]]:
+    if file == "-":
+        # read everything up front, a prompt for steps can't eat the next commands
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(file) as f:
+            lines = f.read().splitlines()
+
+    return [shlex.split(x) for x in lines if x.strip() and not x.strip().startswith("#")]
+
+def run_batch(parser: argparse.ArgumentParser, args: Any) -> None:
+    try:
+        commands = read_batch(args.batch)
+    except OSError as e:
+        Logger.error_exit(f"Can't read batch file: {e}")
+
+    # every line is checked before anything runs
+    commands_args = [GooglePlayAchievementUnlocker.command_args(parser, x, args, session_options) for x in commands]
+
+    g = GooglePlayAchievementUnlocker(args)
+    writable = any(GooglePlayAchievementUnlocker.writes(x) for x in commands_args)
+    if writable:
+        # opened for writing up front, reopening mid-batch would end the transaction
+        g.ensure_writable()
+
+    per_batch = writable and args.batch_tx == "batch"
+    per_command = args.batch_tx == "command"
+
+    timings: List[Tuple[List[str], float]] = []
+    # 1-based number of the command that failed, None while all went through
+    failed: Optional[int] = None
+    try:
+        with g.db.transaction() if per_batch else contextlib.nullcontext():
+            for i, (argv, command_args) in enumerate(zip(commands, commands_args), 1):
+                command_args.input = g.args.input
+                start = time.perf_counter()
+                try:
+                    writes = per_command and GooglePlayAchievementUnlocker.writes(command_args)
+                    with g.db.transaction() if writes else contextlib.nullcontext():
+                        g.args = command_args
+                        g.run()
+                except BaseException:
+                    failed = i
+                    raise
+                finally:
+                    timings.append((argv, time.perf_counter() - start))
+    finally:
+        print_timings(timings, len(commands), failed, rolled_back=per_batch)
+        g.db.close()
+
+def print_timings(timings: List[Tuple[List[str], float]], count: int, failed: Optional[int]=None, rolled_back: bool=False) -> None:
+    width = len(str(count))
+    for i, (argv, elapsed) in enumerate(timings, 1):
+        Logger.info(f"[{i:>{width}}] {elapsed:.3f}s {shlex.join(argv)}")
+
+    total = sum(x for _, x in timings)
+    if failed is not None:
+        Logger.error(f"Command {failed} of {count} failed" + (", nothing was written" if rolled_back else ""))
+    Logger.info(f"Batch: {len(timings)} commands in {total:.3f}s")
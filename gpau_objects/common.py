@@ -1,7 +1,37 @@
+import os
 import sys
 import json
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Any, Iterable, Iterator
+
+def cache_dir() -> str:
+    # caches live next to the tool unless GPAU_CACHE_DIR says otherwise
+    default = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".gpau_cache")
+    return os.environ.get("GPAU_CACHE_DIR", default)
+
+def default_socket() -> str:
+    return os.environ.get("GPAU_SOCKET", os.path.join(cache_dir(), "gpau.sock"))
+
+def file_signature(file: str) -> List[int]:
+    # mtime/size of the db and its -wal, GMS writes land in the wal before a checkpoint
+    sig = []
+    for f in (file, file + "-wal"):
+        try:
+            st = os.stat(f)
+            sig += [st.st_mtime_ns, st.st_size]
+        except OSError:
+            sig += [0, 0]
+    return sig
+
+def chunks(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
 
 class Logger:
     VERBOSE: bool = True
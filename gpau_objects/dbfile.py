@@ -1,7 +1,18 @@
 from gpau_objects.structure import AchievementPendingOp, Wrapper, AchievementDefinition, AchievementInstance, ClientContext, GameInstance, GamePlayerId, Game, Image, Player
-from gpau_objects.common import Logger
-from sqlite3 import Connection
-from typing import Dict, List, Any
+from gpau_objects.common import Logger, chunks
+from gpau_objects import query
+from gpau_objects.decoder import schema_fingerprint, get_decoder
+from gpau_objects.stats import QueryStats
+import os
+import json
+import time
+import sqlite3
+from sqlite3 import Connection, Cursor
+from contextlib import contextmanager
+from typing import Dict, List, Any, Iterator, Optional, Sequence, Tuple, Union, Callable
+
+def casefold(value: Any) -> Optional[str]:
+    return value.casefold() if isinstance(value, str) else value
 
 class DbFile:
     mapping = {
@@ -16,9 +27,93 @@ class DbFile:
         "players": Player
     }
 
-    def __init__(self, connection: Connection):
+    # stays below SQLITE_MAX_VARIABLE_NUMBER of older sqlite builds (999)
+    in_chunk_size = 500
+    # rows per fetchmany() of the iter_* methods
+    fetch_size = 256
+
+    # applied to read-only connections, query_only guards against accidental writes
+    readonly_pragmas = [
+        "pragma query_only = 1",
+        "pragma temp_store = memory",
+        "pragma cache_size = -16384",
+        "pragma mmap_size = 268435456",
+    ]
+
+    # called with every statement sqlite runs on the connections opened from now on
+    # (benchmarks/budget.py counts them)
+    trace: Optional[Callable[[str], None]] = None
+
+    def __init__(self, connection: Connection, readonly: bool=False):
         self.connection = connection
+        if DbFile.trace is not None:
+            self.connection.set_trace_callback(DbFile.trace)
+        # sqlite's lower() and like only fold ascii, the name searches compare casefold()ed text
+        self.connection.create_function("casefold", 1, casefold, deterministic=True)
+        self.readonly = readonly
         self.cur = self.connection.cursor()
+        self.table_columns: Dict[str, Tuple[str, ...]] = {}
+        self.table_fingerprints: Dict[str, str] = {}
+        self.write_listeners: List[Callable[[str], None]] = []
+        # set to a QueryStats to measure every statement (--stats)
+        self.stats: Optional[QueryStats] = None
+
+    @classmethod
+    def open(cls, file: str, readonly: bool=False, snapshot: bool=False) -> "DbFile":
+        if not readonly:
+            return cls(sqlite3.connect(file, cached_statements=query.STATEMENT_CACHE_SIZE))
+
+        # only these end or break a sqlite uri path, urllib.parse is slow to import
+        path = os.path.abspath(file).replace("%", "%25").replace("?", "%3f").replace("#", "%23")
+        uri = "file:" + path + "?mode=ro"
+        connection = sqlite3.connect(uri, uri=True, cached_statements=query.STATEMENT_CACHE_SIZE)
+
+        if snapshot:
+            # copy the whole database into memory, so the file isn't locked while we work
+            memory = sqlite3.connect(":memory:", cached_statements=query.STATEMENT_CACHE_SIZE)
+            connection.backup(memory)
+            connection.close()
+            connection = memory
+
+        for pragma in cls.readonly_pragmas:
+            connection.execute(pragma)
+
+        return cls(connection, readonly=True)
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def execute(self, sql: str, params: Sequence[Any]=()) -> Cursor:
+        # every statement goes through execute, fetch or execute_many, so --stats sees it
+        if self.stats is None:
+            return self.cur.execute(sql, params)
+        start = time.perf_counter()
+        cur = self.cur.execute(sql, params)
+        self.stats.record(self.connection, sql, params, max(cur.rowcount, 0), time.perf_counter() - start)
+        return cur
+
+    def fetch(self, sql: str, params: Sequence[Any]=()) -> List[Any]:
+        if self.stats is None:
+            return self.cur.execute(sql, params).fetchall()
+        start = time.perf_counter()
+        rows = self.cur.execute(sql, params).fetchall()
+        self.stats.record(self.connection, sql, params, len(rows), time.perf_counter() - start)
+        return rows
+
+    def execute_many(self, sql: str, rows: List[Sequence[Any]]) -> None:
+        if self.stats is None:
+            self.cur.executemany(sql, rows)
+            return
+        start = time.perf_counter()
+        self.cur.executemany(sql, rows)
+        self.stats.record(self.connection, sql, rows[0] if rows else (), len(rows), time.perf_counter() - start)
+
+    def on_write(self, listener: Callable[[str], None]) -> None:
+        self.write_listeners.append(listener)
+
+    def written(self, table: str) -> None:
+        for listener in self.write_listeners:
+            listener(table)
 
     def __get_table_by_cls(self, cls: type):
         try:
@@ -28,11 +123,50 @@ class DbFile:
             name = cls.__name__ if isinstance(cls, type) else cls
             Logger.error_exit(f"Given class '{name}' doesn't have associated table")
 
-    def select_by_cls(self, cls: type=None, cols: List[str]=None, values: List[Any]=None, first: bool=False, exact: bool=False):
-        return self.select(cls=cls, cols=cols, values=values, first=first, exact=exact)
+    def columns(self, table: str) -> Tuple[str, ...]:
+        if table not in self.table_columns:
+            if table not in self.mapping:
+                Logger.error_exit(f"Unknown table '{table}'")
+            info = self.fetch(f"pragma table_info({table})")
+            if not info:
+                Logger.error_exit(f"Table '{table}' doesn't exist in the database")
+            self.table_columns[table] = tuple(x[1] for x in info)
+            self.table_fingerprints[table] = schema_fingerprint(table, info)
+        return self.table_columns[table]
+
+    def fingerprint(self, table: str) -> str:
+        self.columns(table)
+        return self.table_fingerprints[table]
+
+    def check_columns(self, table: str, cols: List[str]) -> Tuple[str, ...]:
+        known = self.columns(table)
+        for c in cols:
+            if c not in known:
+                Logger.error_exit(f"Unknown column '{c}' in table '{table}'")
+        return tuple(cols)
+
+    def check_fields(self, table: str, fields: Optional[List[str]], *required: str) -> Tuple[str, ...]:
+        # projection for select, () means every column, _id and required columns are always read
+        if not fields:
+            return ()
+        return self.check_columns(table, list(dict.fromkeys(["_id", *required, *fields])))
+
+    def decoder(self, cls: Optional[type], fields: Tuple[str, ...]=()) -> Callable[[Any], Any]:
+        # rows of 'select *' come in table_info order, projected rows in fields order
+        if cls is None:
+            return lambda row: row
+        table = self.__get_table_by_cls(cls)
+        for f in fields:
+            if f not in cls.fields():
+                Logger.error_exit(f"Column '{f}' of '{table}' isn't a field of {cls.__name__}")
+        columns = fields or self.columns(table)
+        return get_decoder(cls, self.fingerprint(table), columns, bool(fields))
 
-    def select_by_cls_fe(self, cls: type=None, cols: List[str]=None, values: List[Any]=None):
-        return self.select(cls=cls, cols=cols, values=values, first=True, exact=True)
+    def select_by_cls(self, cls: type=None, cols: List[str]=None, values: List[Any]=None, first: bool=False, exact: bool=False, fields: List[str]=None):
+        return self.select(cls=cls, cols=cols, values=values, first=first, exact=exact, fields=fields)
+
+    def select_by_cls_fe(self, cls: type=None, cols: List[str]=None, values: List[Any]=None, fields: List[str]=None):
+        return self.select(cls=cls, cols=cols, values=values, first=True, exact=True, fields=fields)
 
     def search_by_cls(self, search: str, cls: type=None, first: bool=False, exact: bool=False):
         return self.search(search=search, cls=cls, first=first, exact=exact)
@@ -40,21 +174,21 @@ class DbFile:
     def search_by_cls_fe(self, search: str, cls: type=None):
         return self.search(search=search, cls=cls, first=True, exact=True)
 
-    def search(self, search: str, table: str=None, cls: type=None, first: bool=False, exact: bool=False):
+    def __search_query(self, search: str, table: str, cls: Optional[type], exact: bool, fields: Tuple[str, ...]) -> Tuple[str, List[Any]]:
+        s = str(search).lower()
+        known = self.columns(table)
+        cols = tuple(x for x in cls().attrs() if x in known) if cls is not None else known
+        value = s if exact else query.like_value(s)
+        return query.search_sql(table, cols, exact, fields), [value] * len(cols)
+
+    def search(self, search: str, table: str=None, cls: type=None, first: bool=False, exact: bool=False, fields: List[str]=None):
         if cls is not None:
             table = self.__get_table_by_cls(cls)
 
-        s = str(search).lower()
-        sql = f"select * from {table} where (1=0"
-        for col in cls().attrs():
-            if exact:
-                sql += f" or lower({col})='{s}'"
-            else:
-                sql += f" or lower({col}) like '%{s}%'"
-        sql += ") order by _id"
-
-        res = self.cur.execute(sql).fetchall()
-        res = [x if cls is None else cls(*x) for x in res]
+        projection = self.check_fields(table, fields)
+        sql, params = self.__search_query(search, table, cls, exact, projection)
+        res = self.fetch(sql, params)
+        res = list(map(self.decoder(cls, projection), res))
 
         if len(res):
             return res[0] if first else res
@@ -89,10 +223,7 @@ class DbFile:
             return res[0] if first else res
         return None if first else []
 
-    def select(self, table: str=None, cols: List[str]=None, values: List[Any]=None, cls: type=None, first: bool=False, exact: bool=False):
-        if cls is not None:
-            table = self.__get_table_by_cls(cls)
-
+    def __select_query(self, table: str, cols: Optional[List[str]], values: Optional[List[Any]], exact: bool, fields: Tuple[str, ...]) -> Tuple[str, List[Any]]:
         cil = isinstance(cols, list)
         if not cil: cols = []
         vil = isinstance(values, list)
@@ -100,47 +231,283 @@ class DbFile:
         if cil and vil and len(cols) != len(values):
             Logger.error_exit("Given cols doesn't have appropriate number of values")
 
-        sql = f"select * from {table} where 1=1"
-        for c, v in zip(cols, values):
-            if exact:
-                sql += f" and {c}='{v}'"
-            else:
-                sql += f" and {c} like '%{v}%'"
-        sql += " order by _id"
+        sql = query.select_sql(table, self.check_columns(table, cols), exact, fields)
+        params = values if exact else [query.like_value(v) for v in values]
+        return sql, params
 
-        res = self.cur.execute(sql).fetchall()
-        res = [x if cls is None else cls(*x) for x in res]
+    def select(self, table: str=None, cols: List[str]=None, values: List[Any]=None, cls: type=None, first: bool=False, exact: bool=False, fields: List[str]=None):
+        if cls is not None:
+            table = self.__get_table_by_cls(cls)
+
+        projection = self.check_fields(table, fields)
+        sql, params = self.__select_query(table, cols, values, exact, projection)
+        res = self.fetch(sql, params)
+        res = list(map(self.decoder(cls, projection), res))
 
         if len(res):
             return res[0] if first else res
         return None if first else []
 
+    def select_first(self, cls: type) -> Optional[Any]:
+        table = self.__get_table_by_cls(cls)
+        self.columns(table)
+        rows = self.fetch(f"select * from {table} order by _id limit 1")
+        return self.decoder(cls)(rows[0]) if rows else None
+
+    def iter_rows(self, sql: str, params: List[Any], decode: Callable[[Any], Any], size: int=None) -> Iterator[Any]:
+        # own cursor, so other queries can run while the rows are being consumed
+        cur = self.connection.cursor()
+        # only the time spent in sqlite counts, not the consumer's
+        elapsed = 0.0
+        count = 0
+        try:
+            start = time.perf_counter()
+            cur.execute(sql, params)
+            elapsed += time.perf_counter() - start
+            while True:
+                start = time.perf_counter()
+                rows = cur.fetchmany(size or self.fetch_size)
+                elapsed += time.perf_counter() - start
+                if not rows:
+                    break
+                count += len(rows)
+                for row in rows:
+                    yield decode(row)
+        finally:
+            cur.close()
+            if self.stats is not None:
+                self.stats.record(self.connection, sql, params, count, elapsed)
+
+    def iter(self, table: str=None, cols: List[str]=None, values: List[Any]=None, cls: type=None, exact: bool=False, size: int=None, fields: List[str]=None) -> Iterator[Any]:
+        if cls is not None:
+            table = self.__get_table_by_cls(cls)
+
+        projection = self.check_fields(table, fields)
+        sql, params = self.__select_query(table, cols, values, exact, projection)
+        return self.iter_rows(sql, params, self.decoder(cls, projection), size)
+
+    def iter_by_cls(self, cls: type, cols: List[str]=None, values: List[Any]=None, exact: bool=False, size: int=None, fields: List[str]=None) -> Iterator[Any]:
+        return self.iter(cls=cls, cols=cols, values=values, exact=exact, size=size, fields=fields)
+
+    def iter_search(self, search: str, table: str=None, cls: type=None, exact: bool=False, size: int=None, fields: List[str]=None) -> Iterator[Any]:
+        if cls is not None:
+            table = self.__get_table_by_cls(cls)
+
+        projection = self.check_fields(table, fields)
+        sql, params = self.__search_query(search, table, cls, exact, projection)
+        return self.iter_rows(sql, params, self.decoder(cls, projection), size)
+
+    def iter_search_by_cls(self, search: str, cls: type, exact: bool=False, size: int=None, fields: List[str]=None) -> Iterator[Any]:
+        return self.iter_search(search, cls=cls, exact=exact, size=size, fields=fields)
+
+    def select_in(self, col: str, values: List[Any], table: str=None, cls: type=None, cols: List[str]=None, cols_values: List[Any]=None, first: bool=True, fields: List[str]=None) -> Dict[Any, Any]:
+        if cls is not None:
+            table = self.__get_table_by_cls(cls)
+
+        cols = cols or []
+        cols_values = cols_values or []
+        if len(cols) != len(cols_values):
+            Logger.error_exit("Given cols doesn't have appropriate number of values")
+
+        self.check_columns(table, [col])
+        extra = self.check_columns(table, cols)
+        projection = self.check_fields(table, fields, col)
+        decode = self.decoder(cls, projection)
+        found: Dict[Any, Any] = {}
+        keys = list(dict.fromkeys(x for x in values if x is not None))
+
+        for chunk in chunks(keys, self.in_chunk_size):
+            sql = query.select_in_sql(table, col, len(chunk), extra, projection)
+            rows = self.fetch(sql, chunk + cols_values)
+            key_index = [x[0] for x in self.cur.description].index(col)
+            for row in rows:
+                obj = decode(row)
+                if first:
+                    found.setdefault(row[key_index], obj)
+                else:
+                    found.setdefault(row[key_index], []).append(obj)
+
+        return found
+
+    def select_by_cls_in(self, cls: type, col: str, values: List[Any], cols: List[str]=None, cols_values: List[Any]=None, first: bool=True, fields: List[str]=None) -> Dict[Any, Any]:
+        return self.select_in(col, values, cls=cls, cols=cols, cols_values=cols_values, first=first, fields=fields)
+
+    def find_achievements(
+        self,
+        search: Optional[str]=None,
+        ranked_ids: Optional[List[int]]=None,
+        game_id: Any=None,
+        states: Optional[Tuple[bool, bool]]=(True, True),
+        types: Tuple[bool, bool, bool]=(True, True, True)
+    ) -> List[AchievementDefinition]:
+        # ranked_ids (from the search index) replace the like scan of search and keep their order
+        params: List[Any] = []
+        mode = ""
+        if ranked_ids is not None:
+            mode = "ids"
+            params.append(json.dumps(ranked_ids))
+        elif search is not None:
+            mode = "like"
+            params += [search.casefold()] * 2
+        if game_id is not None:
+            params.append(game_id)
+
+        sql = query.achievements_sql(mode, game_id is not None, states, types)
+        return list(map(self.decoder(AchievementDefinition), self.fetch(sql, params)))
+
+    def game_completion_stats(self, not_100: bool=False) -> List[Tuple[int, Optional[str], str, int, int, bool]]:
+        # (game _id, package_name, name, unlocked, total, in cc) for every listable game,
+        # first installed instance and first achievement instance win, like the Finder lookups
+        sql = """
+            select g._id,
+                   gi.package_name,
+                   coalesce(nullif(g.display_name, ''), gi.package_name),
+                   coalesce(sum(ai.state = 0), 0) as unlocked,
+                   count(ad._id) as total,
+                   cc.package_name is not null
+            from games g
+            left join (
+                select instance_game_id, package_name, min(_id)
+                from game_instances where installed = 1 group by instance_game_id
+            ) gi on gi.instance_game_id = g._id
+            left join (
+                select distinct package_name from client_contexts
+            ) cc on cc.package_name = gi.package_name
+            left join achievement_definitions ad on ad.game_id = g._id
+            left join (
+                select definition_id, state, min(_id)
+                from achievement_instances group by definition_id
+            ) ai on ai.definition_id = ad._id
+            where coalesce(g.display_name, '') != '' or gi.instance_game_id is not null
+            group by g._id"""
+        if not_100:
+            sql += " having total > 0 and unlocked < total"
+        sql += " order by g._id"
+
+        return [(x[0], x[1], x[2], x[3], x[4], bool(x[5])) for x in self.fetch(sql)]
+
     def ex(self, table: str):
-        return self.cur.execute("select * from " + table + " order by _id")
-
-    def remove_duplicate_pending_ops(self, by_col: str="external_achievement_id"):
-        ops = [AchievementPendingOp(*x) for x in self.ex("achievement_pending_ops").fetchall()]
-        seen = set()
-        removed = 0
-        for op in ops:
-            if getattr(op, by_col) in seen:
-                self.cur.execute("delete from achievement_pending_ops where _id = ?", (op.id,))
-                removed += 1
-            else:
-                seen.add(getattr(op, by_col))
-        self.connection.commit()
+        self.columns(table)
+        return self.execute("select * from " + table + " order by _id")
+
+    def remove_duplicate_pending_ops(self, by_cols: Union[str, List[str]]="external_achievement_id") -> List[AchievementPendingOp]:
+        if isinstance(by_cols, str):
+            by_cols = [by_cols]
+        key = ",".join(self.check_columns("achievement_pending_ops", by_cols))
+
+        # the op with the lowest _id of every key stays
+        where = f"where _id not in (select min(_id) from achievement_pending_ops group by {key})"
+
+        with self.transaction():
+            removed = list(map(self.decoder(AchievementPendingOp), self.fetch(
+                f"select * from achievement_pending_ops {where} order by _id")))
+            if removed:
+                self.execute(f"delete from achievement_pending_ops {where}")
+        self.written("achievement_pending_ops")
+
         return removed
 
+    def compact_pending_ops(self) -> Tuple[int, int, int]:
+        # one op per (achievement, player, client context): incremental steps are summed
+        # and capped at total_steps, ops of already unlocked achievements are dropped.
+        # Returns (ops merged into others, ops dropped as unlocked, ops left)
+        sql = """
+            select op._id, op.external_achievement_id, op.external_player_id, op.client_context_id,
+                   op.achievement_type, op.steps_to_increment, d.total_steps, i.state
+            from achievement_pending_ops op
+            left join (
+                select _id, external_achievement_id, total_steps, min(_id)
+                from achievement_definitions group by external_achievement_id
+            ) d on d.external_achievement_id = op.external_achievement_id
+            left join (
+                select definition_id, state, min(_id)
+                from achievement_instances group by definition_id
+            ) i on i.definition_id = d._id
+            order by op._id"""
+
+        with self.transaction():
+            groups: Dict[Tuple[Any, Any, Any], List[Tuple[Any, ...]]] = {}
+            for row in self.fetch(sql):
+                groups.setdefault((row[1], row[2], row[3]), []).append(row)
+
+            deleted: List[List[Any]] = []
+            updated: List[List[Any]] = []
+            dropped = 0
+            for rows in groups.values():
+                first = rows[0]
+                if first[7] == 0:
+                    dropped += len(rows)
+                    deleted += [[x[0]] for x in rows]
+                    continue
+
+                deleted += [[x[0]] for x in rows[1:]]
+                if first[4] == 1 and len(rows) > 1:
+                    steps = sum(int(x[5]) for x in rows if str(x[5]).strip().isdigit())
+                    if first[6] is not None:
+                        steps = min(steps, first[6])
+                    updated.append([steps, first[0]])
+
+            self.execute_many("delete from achievement_pending_ops where _id = ?", deleted)
+            self.execute_many("update achievement_pending_ops set steps_to_increment = ? where _id = ?", updated)
+        self.written("achievement_pending_ops")
+
+        return len(deleted) - dropped, dropped, sum(len(x) for x in groups.values()) - len(deleted)
+
     def empty_pending_ops(self):
-        self.cur.execute("delete from achievement_pending_ops")
-        self.connection.commit()
+        with self.transaction():
+            self.execute("delete from achievement_pending_ops")
+        self.written("achievement_pending_ops")
 
     def add_pending_op(self, op: Dict[str, Any]):
         sql = "insert into achievement_pending_ops values ({})".format(
             ",".join("?" for _ in range(len(op))))
-        self.cur.execute(sql, list(op.values()))
+        with self.transaction():
+            self.execute(sql, list(op.values()))
+        self.written("achievement_pending_ops")
+
+    def add_pending_ops(self, ops: List[Dict[str, Any]]) -> int:
+        if not ops:
+            return 0
+
+        cols = [x for x in ops[0].keys() if x != "_id"]
+        sql = "insert into achievement_pending_ops (_id, {}) values ({})".format(
+            ",".join(cols), ",".join("?" for _ in range(len(cols) + 1)))
+
+        with self.transaction():
+            ids = self.reserve_pending_op_ids(len(ops))
+            rows = [[i] + [op[c] for c in cols] for i, op in zip(ids, ops)]
+            self.execute_many(sql, rows)
+        self.written("achievement_pending_ops")
+
+        return len(rows)
+
+    def reserve_pending_op_ids(self, count: int) -> range:
+        # only safe inside a write transaction, otherwise GMS could take the same ids
+        start = self.get_next_pending_op_id()
+        return range(start, start + count)
+
+    @contextmanager
+    def transaction(self) -> Iterator[Cursor]:
+        if self.connection.in_transaction:
+            # inside an outer transaction (e.g. a --batch), only this part is undone on errors
+            self.execute("savepoint nested")
+            try:
+                yield self.cur
+            except BaseException:
+                self.execute("rollback to nested")
+                self.execute("release nested")
+                raise
+            self.execute("release nested")
+            return
+
+        self.execute("begin immediate")
+        try:
+            yield self.cur
+        except BaseException:
+            self.connection.rollback()
+            raise
         self.connection.commit()
 
     def get_next_pending_op_id(self):
-        res = self.cur.execute("select max(_id) from achievement_pending_ops").fetchone()[0]
+        res = self.fetch("select max(_id) from achievement_pending_ops")[0][0]
         return 0 if res is None else res + 1
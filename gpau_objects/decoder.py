@@ -0,0 +1,39 @@
+import hashlib
+from typing import Any, Callable, Dict, List, Tuple
+
+# Row decoders map the columns a statement returns to Wrapper fields by name,
+# so a GMS update that adds or reorders columns can't shift values into the
+# wrong attributes. Each decoder is generated once per (class, schema
+# fingerprint, projection) and reused for every row after that.
+
+Decoder = Callable[[Tuple[Any, ...]], Any]
+
+# code name of the generated decoders, --profile counts them as decode
+filename = "<gpau-decoder>"
+
+decoders: Dict[Tuple[type, str, Tuple[str, ...]], Decoder] = {}
+
+def schema_fingerprint(table: str, table_info: List[Tuple[Any, ...]]) -> str:
+    # name and declared type of every column, in order (pragma table_info rows)
+    schema = repr((table, [(x[1], x[2]) for x in table_info]))
+    return hashlib.sha1(schema.encode()).hexdigest()[:16]
+
+def compile_decoder(cls: type, columns: Tuple[str, ...], partial: bool) -> Decoder:
+    index = {c: i for i, c in enumerate(columns)}
+    names = columns if partial else cls.fields()
+
+    lines = ["def decode(row):", "    obj = new(cls)"]
+    for name in names:
+        lines.append(f"    obj.{name} = row[{index[name]}]" if name in index else f"    obj.{name} = None")
+    lines.append("    obj._projection = projection" if partial else "    obj._projection = None")
+    lines.append("    return obj")
+
+    scope: Dict[str, Any] = {"new": object.__new__, "cls": cls, "projection": columns}
+    exec(compile("\n".join(lines) + "\n", filename, "exec"), scope)
+    return scope["decode"]
+
+def get_decoder(cls: type, fingerprint: str, columns: Tuple[str, ...], partial: bool) -> Decoder:
+    key = (cls, fingerprint, columns if partial else ())
+    if key not in decoders:
+        decoders[key] = compile_decoder(cls, columns, partial)
+    return decoders[key]
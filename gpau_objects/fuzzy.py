@@ -0,0 +1,123 @@
+import os
+import re
+import math
+import heapq
+import json
+import hashlib
+from collections import Counter
+from gpau_objects.common import cache_dir, file_signature
+from gpau_objects.dbfile import DbFile
+from typing import Dict, List, Optional, Set
+
+# In-memory trigram index for typo tolerant searches ("plauge inc"). Every word
+# is padded like pg_trgm does ("  plague "), a row is a candidate when it shares
+# at least `threshold` of the query's trigrams and candidates are ranked by the
+# shared count, shorter rows first on ties. Built once per session from the
+# db and saved as json to the cache dir, keyed by the db's mtime/size. The cache
+# dir is writable by the user, json loads data and nothing else.
+
+def trigrams(text: Optional[str]) -> Set[str]:
+    grams: Set[str] = set()
+    for word in re.findall(r"\w+", (text or "").lower()):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+class FuzzyIndex:
+    version = 2
+    # share of the query's trigrams a row needs (pg_trgm's default similarity)
+    threshold = 0.3
+    # trigrams in more rows than this share don't bring in candidates
+    max_df = 0.02
+
+    sources: Dict[str, List[str]] = {
+        "achievement_definitions": ["name", "description"],
+        "games": ["display_name"],
+    }
+
+    def __init__(self, table: str) -> None:
+        self.table = table
+        self.ids: List[int] = []
+        self.sizes: List[int] = []
+        self.postings: Dict[str, List[int]] = {}
+        # set views of the postings the searches needed, built on first use
+        self.sets: Dict[str, Set[int]] = {}
+
+    @classmethod
+    def load(cls, db: DbFile, file: str, table: str) -> "FuzzyIndex":
+        name = hashlib.sha1(os.path.abspath(file).encode()).hexdigest()[:16]
+        path = os.path.join(cache_dir(), f"fuzzy_{name}_{table}.json")
+        signature = [cls.version, file_signature(file)]
+
+        try:
+            with open(path) as f:
+                cached = json.load(f)
+            # anything else (older version, changed db, a damaged file) is a miss
+            if cached["signature"] == signature and len(cached["ids"]) == len(cached["sizes"]) and isinstance(cached["postings"], dict):
+                index = cls(table)
+                index.ids, index.sizes, index.postings = cached["ids"], cached["sizes"], cached["postings"]
+                return index
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+        index = cls.build(db, table)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path + ".tmp", "w") as f:
+                json.dump({"signature": signature, "ids": index.ids, "sizes": index.sizes, "postings": index.postings}, f, separators=(",", ":"))
+            os.replace(path + ".tmp", path)
+        except OSError:
+            # kept in memory only, the next session builds it again
+            pass
+        return index
+
+    @classmethod
+    def build(cls, db: DbFile, table: str) -> "FuzzyIndex":
+        index = cls(table)
+        cols = [x for x in cls.sources[table] if x in db.columns(table)]
+
+        for obj in db.iter_by_cls(db.mapping[table], fields=cols):
+            grams = trigrams(" ".join(str(getattr(obj, x) or "") for x in cols))
+            doc = len(index.ids)
+            index.ids.append(obj.id)
+            index.sizes.append(len(grams))
+            for gram in grams:
+                index.postings.setdefault(gram, []).append(doc)
+
+        return index
+
+    def posting_set(self, gram: str) -> Set[int]:
+        if gram not in self.sets:
+            self.sets[gram] = set(self.postings.get(gram, ()))
+        return self.sets[gram]
+
+    def search(self, text: str, limit: Optional[int]=None) -> List[int]:
+        # _ids of the closest rows, best first
+        query = trigrams(text)
+        if not query:
+            return []
+
+        # candidates only come from the rare trigrams (in at most max_df of the
+        # rows), a row sharing nothing but "the"/"of"/"ing" isn't a match worth
+        # showing. The common trigrams are then only counted for the candidates.
+        # `need` counts every query trigram, also those no row has
+        need = max(1, math.ceil(self.threshold * len(query)))
+        grams = sorted(query, key=lambda x: len(self.postings.get(x, ())))
+        common = max(1, int(len(self.ids) * self.max_df))
+        grams = [x for x in grams if x in self.postings]
+        rare = [x for x in grams if len(self.postings[x]) <= common]
+        if not rare:
+            # only common trigrams, a match has at least one of the len - need + 1 rarest
+            rare = grams[:max(1, len(grams) - need + 1)]
+
+        counts: Counter = Counter()
+        for gram in rare:
+            counts.update(self.postings.get(gram, ()))
+
+        candidates = set(counts)
+        for gram in grams[len(rare):]:
+            counts.update(candidates.intersection(self.posting_set(gram)))
+
+        found = [(-shared, self.sizes[doc], doc) for doc, shared in counts.items() if shared >= need]
+        ranked = heapq.nsmallest(limit, found) if limit else sorted(found)
+        return [self.ids[doc] for _, _, doc in ranked]
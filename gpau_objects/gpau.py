@@ -1,41 +1,44 @@
 import os
+import copy
 import glob
-import traceback
-import sqlite3 as sql
+import time
 from gpau_objects.structure import *
 from gpau_objects.common import *
 from gpau_objects.dbfile import DbFile
+from gpau_objects.graph import GraphFinder
+from gpau_objects.search import SearchIndex
+from gpau_objects.stats import QueryStats
+from gpau_objects import query
+from gpau_objects.players import find_players
+from gpau_objects.accounts import for_each_account
+from gpau_objects.readme import readme_text
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from gpau_objects.fuzzy import FuzzyIndex
 
 class GooglePlayAchievementUnlocker:
     default_db_regex = "/data/data/com.google.android.gms/databases/games_*.db"
     # default_db_regex = "dbs/games_*.db"
+    # results of a --fuzzy search
+    fuzzy_limit = 25
 
-    readme_text = """
-HOW TO USE?
-1) Disconnect from the internet
-2) Unlock the achievements you want
-3) Reconnect to the internet
-4) Run Google Play Games to sync the achievements
-5) Profit
-
-ACHIEVEMENT FLAGS?
-NOR - normal
-INC - incremental
-SEC - secret
-
-GAME WON'T APPEAR IN --list-cc? Try one of these:
-1) Play the game for a couple of minutes
-2) In-app button to logout and login again
-3) Earn any achievement
-4) Re/Open Google Play App
-5) Clear Cache/All data and login again
-6) Restart phone\n"""
+    readme_text = readme_text
 
     def __init__(self, a):
         self.args: Dummy = a
         self.inst_db: Optional[DbFile] = None
         self.inst_finder: Optional[Finder] = None
-        self.reload()
+        self.inst_search_index: Optional[SearchIndex] = None
+        self.fuzzy_indexes: Dict[str, "FuzzyIndex"] = {}
+        self.fuzzy_db: Optional[DbFile] = None
+        # listing output is collected here instead of printed when set (see run_all_players)
+        self.output: Optional[List[str]] = None
+        self.stats: Optional[QueryStats] = None
+        self.use_stats()
+        if not self.args.readme:
+            # --readme needs no db, run() prints it and exits
+            self.reload()
 
     @property
     def db(self) -> DbFile:
@@ -47,10 +50,83 @@ GAME WON'T APPEAR IN --list-cc? Try one of these:
         assert self.inst_finder is not None, "Finder not loaded"
         return self.inst_finder
     
-    def get_db_files(self):
-        return glob.glob(self.default_db_regex)
+    def use_stats(self):
+        # a fresh collector for every command run with --stats
+        self.stats = QueryStats() if self.args.stats else None
+        if self.inst_db is not None:
+            self.inst_db.stats = self.stats
+
+    def report_stats(self):
+        assert self.stats is not None
+        self.stats.report(self.args.stats, {
+            "finder_cache": self.finder.cache_info(),
+            "statement_cache": query.cache_info(),
+        })
+
+    @property
+    def search_index(self) -> SearchIndex:
+        # follows the db, a reopened connection gets a fresh index handle
+        if self.inst_search_index is None or self.inst_search_index.db is not self.db:
+            if self.inst_search_index is not None:
+                self.inst_search_index.close()
+            self.inst_search_index = SearchIndex(self.db, self.args.input)
+        return self.inst_search_index
+
+    def fuzzy_index(self, table: str) -> "FuzzyIndex":
+        # built (or loaded from the cache) once per session and db
+        from gpau_objects.fuzzy import FuzzyIndex
+        if self.fuzzy_db is not self.db:
+            self.fuzzy_indexes = {}
+            self.fuzzy_db = self.db
+        if table not in self.fuzzy_indexes:
+            self.fuzzy_indexes[table] = FuzzyIndex.load(self.db, self.args.input, table)
+        return self.fuzzy_indexes[table]
+
+    @classmethod
+    def get_db_files(cls):
+        return glob.glob(cls.default_db_regex)
+
+    def emit(self, line: str):
+        if self.output is None:
+            print(line)
+        else:
+            self.output.extend(line.split("\n"))
+
+    def report(self, line: str):
+        # status of the ops commands, labeled with the listing under --all-players
+        if self.output is None:
+            Logger.info(line)
+        else:
+            self.emit(line)
+
+    @classmethod
+    def run_all_players(cls, args):
+        if args.unlock_id or args.unlock_all or args.unlock_listed or args.list_players:
+            Logger.error_exit("--all-players works only with listing, searching and removing ops")
+
+        def work(file):
+            account_args = copy.copy(args)
+            account_args.input = file
+            account_args.player = None
+            account_args.all_players = False
+
+            g = cls(account_args)
+            g.output = []
+            try:
+                g.run()
+            finally:
+                g.db.close()
+            return g.output
+
+        for _, label, lines in for_each_account(cls.get_db_files(), work):
+            for line in lines or []:
+                print(f"{label} : {line}")
 
     def reload(self):
+        self.resolve_input()
+        self.reopen()
+
+    def resolve_input(self):
         self.check_player()
 
         if self.args.input is None:
@@ -59,15 +135,53 @@ GAME WON'T APPEAR IN --list-cc? Try one of these:
                 Logger.error_exit("No database file found")
             self.args.input = files[0]
 
+    def reopen(self):
+        if self.inst_db is not None:
+            self.inst_db.close()
+
         errors = self.load_db_file(self.args.input)
 
         if errors:
             Logger.error_exit("\n".join(errors))
 
-    def load_db_file(self, file=None):
+    def needs_write(self) -> bool:
+        return self.writes(self.args)
+
+    @staticmethod
+    def writes(args) -> bool:
+        return bool(
+            args.rem_all_ops or args.rem_dup_ops or args.compact_ops or
+            args.unlock_id or args.unlock_all or args.unlock_listed
+        )
+
+    @staticmethod
+    def command_args(parser, argv: List[str], base, session_options: List[str]):
+        # one command line of a --serve/--batch session, the session's load options carry over
+        args = parser.parse_args(argv)
+        used = [x.option_strings[0] for x in parser._actions if x.dest in session_options and getattr(args, x.dest, None)]
+        if used:
+            Logger.error_exit(f"{', '.join(used)} can't be used in a session command")
+
+        for x in ["preload", "snapshot", "auto_inc_achs", "stats"]:
+            setattr(args, x, getattr(args, x) or getattr(base, x))
+        return args
+
+    def ensure_writable(self):
+        if not self.db.readonly:
+            return
+
+        self.db.close()
+        self.inst_db = DbFile.open(self.args.input)
+        self.inst_db.stats = self.stats
+        self.finder.use_db(self.db)
+
+    def load_db_file(self, file=None, writable=None):
         if file is None:
             file = self.get_db_files()[0]
 
+        if writable is None:
+            writable = self.needs_write()
+
         errors = []
 
         if not os.path.isfile(file):
@@ -76,9 +190,11 @@ GAME WON'T APPEAR IN --list-cc? Try one of these:
             errors.append("Input is not readable")
 
         try:
-            self.inst_db = DbFile(sql.connect(file))
-            self.inst_finder = Finder(self.db)
+            self.inst_db = DbFile.open(file, readonly=not writable, snapshot=self.args.snapshot)
+            self.inst_db.stats = self.stats
+            self.inst_finder = GraphFinder(self.db) if self.args.preload else Finder(self.db)
         except Exception:
+            import traceback
             errors.append(traceback.format_exc())
 
         return errors
@@ -87,120 +203,167 @@ GAME WON'T APPEAR IN --list-cc? Try one of these:
         if self.args.readme:
             Logger.error_exit(self.readme_text)
 
+        if self.stats is None or self.stats.reported:
+            self.use_stats()
+
         try:
             if self.args.rem_all_ops:
-                Logger.info("Removing all pending achievement ops...")
+                self.report("Removing all pending achievement ops...")
+                self.ensure_writable()
                 self.db.empty_pending_ops()
 
             achs: List[AchievementDefinition] = []
 
             if self.args.list_cc:
-                ccs = self.db.select(cls=ClientContext)
-                print("\n".join([x.print_string() for x in ccs]))
+                for cc in self.db.iter_by_cls(ClientContext):
+                    self.emit(cc.print_string())
             elif self.args.list_games:
-                games = self.db.select(cls=Game)
-                game_insts = [self.finder.game_inst_by_game(x) for x in games]
-                print("\n".join([g.print_string(gi) for g, gi in zip(games, game_insts) if gi]))
+                self.print_games(self.db.iter_by_cls(Game, fields=Game.print_fields), installed_only=True)
             elif self.args.list_players:
                 self.list_players()
             elif self.args.list_ops:
-                ops: List[AchievementPendingOp] = [x for x in self.db.select(cls=AchievementPendingOp) if x]
-                print("\n".join([x.print_string() for x in ops]))
+                for op in self.db.iter_by_cls(AchievementPendingOp):
+                    self.emit(op.print_string())
 
             if self.args.list_achs:
-                app = self.get_app()
-                assert app is not None, "Package not found"
-                ach_defs = [x for x in self.finder.ach_defs_by_game_id(app.id) if x]
-                achs = ach_defs
+                achs = self.find_achievements(None, self.get_app(), instance=False)
             elif self.args.list_u_achs:
-                app = self.get_app()
-                assert app is not None, "Package not found"
-                ach_insts = [x for x in self.finder.ach_insts_by_game_id(app.id) if x and x.is_unlocked()]
-                achs = [x for x in self.finder.ach_defs_by_ach_insts(ach_insts) if x]
+                achs = self.find_achievements(None, self.get_app(), locked=False)
             elif self.args.list_nu_achs:
-                app = self.get_app()
-                assert app is not None, "Package not found"
-                ach_insts = [x for x in self.finder.ach_insts_by_game_id(app.id) if x and x.is_locked()]
-                achs = [x for x in self.finder.ach_defs_by_ach_insts(ach_insts) if x]
+                achs = self.find_achievements(None, self.get_app(), unlocked=False)
             elif self.args.list_nor_achs:
-                app = self.get_app()
-                assert app is not None, "Package not found"
-                ach_defs = [x for x in self.finder.ach_defs_by_game_id(app.id) if x and x.is_normal()]
-                achs = ach_defs
+                achs = self.find_achievements(None, self.get_app(), inc=False, sec=False, instance=False)
             elif self.args.list_inc_achs:
-                app = self.get_app()
-                assert app is not None, "Package not found"
-                ach_defs = [x for x in self.finder.ach_defs_by_game_id(app.id) if x and x.is_incremental()]
-                achs = ach_defs
+                achs = self.find_achievements(None, self.get_app(), nor=False, sec=False, instance=False)
             elif self.args.list_sec_achs:
-                app = self.get_app()
-                assert app is not None, "Package not found"
-                ach_defs = [x for x in self.finder.ach_defs_by_game_id(app.id) if x and x.is_secret()]
-                achs = ach_defs
+                achs = self.find_achievements(None, self.get_app(), nor=False, inc=False, instance=False)
 
             opt_app = self.get_app(optional=True)
 
             if self.args.search_games:
-                search = self.args.search_games[0]
-                found_games: List[Game] = self.db.search(search, cls=Game)
-                print("\n".join([x.print_string(self.finder.game_inst_by_game(x)) for x in found_games]))
+                search = self.search_arg(self.args.search_games)
+                if self.args.fuzzy:
+                    ids = self.fuzzy_index("games").search(str(search), self.fuzzy_limit)
+                else:
+                    ids = self.search_index.search("games", str(search))
+                if ids is None:
+                    self.print_games(self.db.iter_search_by_cls(search, Game, fields=Game.print_fields))
+                else:
+                    self.print_games([x for x in self.finder.games_by_ids(ids, fields=Game.print_fields) if x])
             elif self.args.search_achs:
-                achs = self.find_achievements(self.args.search_achs[0], opt_app)
+                achs = self.find_achievements(self.search_arg(self.args.search_achs), opt_app, fuzzy=self.args.fuzzy)
             elif self.args.search_u_achs:
-                achs = self.find_achievements(self.args.search_u_achs[0], opt_app, locked=False)
+                achs = self.find_achievements(self.search_arg(self.args.search_u_achs), opt_app, fuzzy=self.args.fuzzy, locked=False)
             elif self.args.search_nu_achs:
-                achs = self.find_achievements(self.args.search_nu_achs[0], opt_app, unlocked=False)
+                achs = self.find_achievements(self.search_arg(self.args.search_nu_achs), opt_app, fuzzy=self.args.fuzzy, unlocked=False)
             elif self.args.search_nor_achs:
-                achs = self.find_achievements(self.args.search_nor_achs[0], opt_app, inc=False, sec=False)
+                achs = self.find_achievements(self.search_arg(self.args.search_nor_achs), opt_app, fuzzy=self.args.fuzzy, inc=False, sec=False)
             elif self.args.search_inc_achs:
-                achs = self.find_achievements(self.args.search_inc_achs[0], opt_app, nor=False, sec=False)
+                achs = self.find_achievements(self.search_arg(self.args.search_inc_achs), opt_app, fuzzy=self.args.fuzzy, nor=False, sec=False)
             elif self.args.search_sec_achs:
-                achs = self.find_achievements(self.args.search_sec_achs[0], opt_app, nor=False, inc=False)
+                achs = self.find_achievements(self.search_arg(self.args.search_sec_achs), opt_app, fuzzy=self.args.fuzzy, nor=False, inc=False)
 
             if len(achs):
-                print("\n".join([x.print_string() for x in achs]))
+                self.emit("\n".join([x.print_string() for x in achs]))
 
             if self.args.unlock_id:
-                self.unlock_achievement(self.finder.ach_def_by_external_id(self.args.unlock_id[0]))
+                external_id = self.search_arg(self.args.unlock_id)
+                ach_def = self.finder.ach_def_by_external_id(external_id)
+                if ach_def is None:
+                    Logger.error_exit(f"Achievement with external id '{external_id}' not found")
+                self.unlock_achievement(ach_def)
             elif self.args.unlock_all:
                 app = self.get_app()
                 assert app is not None, "Package not found"
                 ach_insts = [x for x in self.finder.ach_insts_by_game_id(app.id) if x]
-                for ach_inst in ach_insts:
-                    self.unlock_achievement(self.finder.ach_def_by_ach_inst(ach_inst))
+                self.unlock_achievements(self.finder.ach_defs_by_ach_insts(ach_insts))
             elif self.args.unlock_listed:
-                for ach in achs:
-                    self.unlock_achievement(ach)
+                self.unlock_achievements(achs)
 
             if self.args.rem_dup_ops:
-                Logger.info("Removing duplicate pending achievement ops...")
-                removed = self.db.remove_duplicate_pending_ops()
-                Logger.info(f"Removed: {removed}")
+                self.report("Removing duplicate pending achievement ops...")
+                self.ensure_writable()
+                dup_key = self.args.dup_key.split(",") if self.args.dup_key else "external_achievement_id"
+                removed = self.db.remove_duplicate_pending_ops(dup_key)
+                for op in removed:
+                    self.report(f"Removed: {op.print_string()}")
+                self.report(f"Removed: {len(removed)}")
+
+            if self.args.compact_ops:
+                self.report("Compacting pending achievement ops...")
+                self.ensure_writable()
+                merged, dropped, left = self.db.compact_pending_ops()
+                self.report(f"Merged: {merged}, dropped (already unlocked): {dropped}, left: {left}")
+
+            if self.args.cache_info:
+                Logger.info(f"Finder cache: {self.finder.cache_info()}")
+
+            if self.stats is not None:
+                self.report_stats()
 
         except Exception:
+            import traceback
             Logger.error_exit(f"{traceback.format_exc()}\nSomething bad has happened, probably a bug or uncut edge case.\nPlease report this to the developer.")
 
+    def print_games(self, games: Iterable[Game], installed_only: bool=False):
+        # instances are resolved per fetched chunk, lines go out as soon as a chunk is read
+        for chunk in chunks(games, self.db.fetch_size):
+            for game, game_inst in zip(chunk, self.finder.game_insts_by_games(chunk, fields=["package_name"])):
+                if game_inst or not installed_only:
+                    self.emit(game.print_string(game_inst))
+
     def unlock_achievement(self, ach_def: Optional[AchievementDefinition]=None):
-        if ach_def is None:
+        self.unlock_achievements([ach_def])
+
+    def unlock_achievements(self, ach_defs: List[Optional[AchievementDefinition]]):
+        ach_defs = [x for x in ach_defs if x]
+        ach_insts = self.finder.ach_insts_by_ach_defs(ach_defs)
+        games = self.finder.games_by_ach_defs(ach_defs)
+        game_insts = self.finder.game_insts_by_games(games)
+        client_contexts = self.finder.client_contexts_by_game_insts(game_insts)
+
+        player_id = None
+        ops = []
+        for ach_def, ach_inst, game, game_inst, client_context in zip(ach_defs, ach_insts, games, game_insts, client_contexts):
+            op = self.build_pending_op(ach_def, ach_inst, game, game_inst, client_context)
+            if op is None:
+                continue
+            if player_id is None:
+                player_id = self.get_player_id()
+            op["external_player_id"] = player_id
+            ops.append(op)
+
+        if not ops:
             return
 
-        ach_inst = self.finder.ach_inst_by_ach_def(ach_def)
+        self.ensure_writable()
+        start = time.perf_counter()
+        added = self.db.add_pending_ops(ops)
+        elapsed = time.perf_counter() - start
+        rate = added / elapsed if elapsed > 0 else float(added)
+        Logger.success(f"Added {added} pending ops in {elapsed:.3f}s ({rate:.0f} rows/s)")
+
+    def build_pending_op(
+        self,
+        ach_def: AchievementDefinition,
+        ach_inst: Optional[AchievementInstance],
+        game: Optional[Game],
+        game_inst: Optional[GameInstance],
+        client_context: Optional[ClientContext]
+    ) -> Optional[Dict[str, Any]]:
         if ach_inst is None:
             Logger.error("Achievement definition doesn't have an associated achievement instance")
-            return
+            return None
         
         if ach_inst.is_unlocked():
             Logger.info(f"Achievement {ach_def.external_achievement_id} is already unlocked...")
-            return
+            return None
 
-        game = self.finder.game_by_ach_inst(ach_inst)
         assert game is not None, "Game not found"
-        game_inst = None if not game else self.finder.game_inst_by_game(game)
-        client_context = None if not game_inst else self.finder.client_context_by_game_inst(game_inst)
 
         if not client_context:
             Logger.error("No client context found for this game")
-            return
+            return None
 
         package_name = "NO_INSTANCE" if not game_inst else game_inst.package_name
         Logger.info(f"Unlocking achievement {ach_def.external_achievement_id} ({package_name})...")
@@ -214,8 +377,8 @@ GAME WON'T APPEAR IN --list-cc? Try one of these:
                 print(f"### Progress: {ach_inst.current_steps}/{ach_def.total_steps}")
                 steps_to_increment = self.get_increment_value()
 
-        self.db.add_pending_op({
-            "_id": self.db.get_next_pending_op_id(),
+        # _id is assigned by DbFile.add_pending_ops, external_player_id by unlock_achievements
+        return {
             "client_context_id": client_context.id,
             "external_achievement_id": ach_def.external_achievement_id,
             "achievement_type": ach_def.type,
@@ -223,12 +386,16 @@ GAME WON'T APPEAR IN --list-cc? Try one of these:
             "steps_to_increment": steps_to_increment,
             "min_steps_to_set": "",
             "external_game_id": game.external_game_id,
-            "external_player_id": self.get_player_id(),
-        })
+            "external_player_id": None,
+        }
 
     def get_increment_value(self):
         print(end='\r')
-        value = input("### Steps to increment by: ")
+        try:
+            value = input("### Steps to increment by: ")
+        except EOFError:
+            # nobody to ask, e.g. a --serve command or a closed stdin
+            Logger.error_exit("No steps given, use --auto-inc-achs")
         try:
             if int(value) < 0:
                 raise ValueError
@@ -237,29 +404,43 @@ GAME WON'T APPEAR IN --list-cc? Try one of these:
             Logger.error("Value must be a number bigger than -1")
             return self.get_increment_value()
 
-    def find_achievements(self, search, package=None, unlocked=True, locked=True, nor=True, inc=True, sec=True) -> List[AchievementDefinition]:
-        achs = self.finder.ach_defs_by_game(package) if package else self.db.select(cls=AchievementDefinition)
-        found_achs: List[AchievementDefinition] = self.db.search_instances_by(search, ["name", "description"], achs)
-
-        ach_insts = self.finder.ach_insts_by_ach_defs(found_achs)
-
-        ach_defs_filtered = [
-            x for x, w in zip(found_achs, ach_insts)
-            if (w and w.is_unlocked() and unlocked) or (w and w.is_locked() and locked)
-        ]
-
-        ach_defs_filtered = [
-            x for x in ach_defs_filtered
-            if (x.is_normal() and nor) or (x.is_incremental() and inc) or (x.is_secret() and sec)
-        ]
-
-        return ach_defs_filtered
+    @staticmethod
+    def search_arg(value) -> str:
+        # argparse gives the whole string, the DEBUG args in gpau.py are one item lists
+        return value[0] if isinstance(value, list) else value
+
+    def find_achievements(self, search, package=None, unlocked=True, locked=True, nor=True, inc=True, sec=True, instance=True, fuzzy=False) -> List[AchievementDefinition]:
+        # one query for all the filters, instance=False also lists definitions without an instance
+        # (the state filters need one)
+        def query(ranked_ids: Optional[List[int]]) -> List[AchievementDefinition]:
+            return self.db.find_achievements(
+                search=None if search is None else str(search),
+                ranked_ids=ranked_ids,
+                game_id=package.id if package else None,
+                states=(unlocked, locked) if instance else None,
+                types=(nor, inc, sec),
+            )
+
+        if search is None:
+            return query(None)
+        if not fuzzy:
+            return query(self.search_index.search("achievement_definitions", str(search)))
+
+        # the filters can drop some of the best matches, ask for more until enough are left
+        index = self.fuzzy_index("achievement_definitions")
+        limit = self.fuzzy_limit
+        while True:
+            ranked_ids = index.search(str(search), limit)
+            achs = query(ranked_ids)
+            if len(achs) >= self.fuzzy_limit or len(ranked_ids) < limit:
+                return achs[:self.fuzzy_limit]
+            limit *= 4
 
     def get_player_id(self):
-        players: List[Player] = self.db.select(cls=Player)
-        if not players:
+        player = self.finder.player()
+        if not player:
             Logger.error_exit("Couldn't find any player")
-        return players[0].external_player_id
+        return player.external_player_id
 
     def list_players(self):
         players = self.get_players()
@@ -267,26 +448,12 @@ GAME WON'T APPEAR IN --list-cc? Try one of these:
         index = 1
         for db_file, db_player in players.items():
             file_name = os.path.basename(db_file)
-            print(f"[{index}] ({file_name}) {db_player.print_string()}")
+            self.emit(f"[{index}] ({file_name}) {db_player.print_string()}")
             index += 1
 
     def get_players(self) -> Dict[str, Player]:
-        current_db_file = self.args.input
-
-        players = {}
-        for db_file in self.get_db_files():
-            errors = self.load_db_file(db_file)
-
-            if not errors:
-                db_players = self.db.select(cls=Player)
-
-                if db_players:
-                    players[db_file] = db_players[0]
-
-        # load back the original db file
-        self.load_db_file(current_db_file)
-
-        return players
+        # read-only and in parallel, the loaded db file stays untouched
+        return find_players(self.get_db_files())
 
     def check_player(self):
         player = self.args.player
@@ -0,0 +1,143 @@
+from gpau_objects.structure import AchievementDefinition, AchievementInstance, ClientContext, GameInstance, Game, Finder
+from gpau_objects.dbfile import DbFile
+from typing import List, Any, Optional, Dict
+
+def int_key(x: Any) -> Any:
+    # mirrors sqlite's integer affinity, e.g. '12' matches _id 12
+    try:
+        return int(x)
+    except (TypeError, ValueError):
+        return x
+
+def str_key(x: Any) -> Any:
+    return None if x is None else str(x)
+
+# answers Finder lookups from in-memory indexes, every table is read only once,
+# the objects are always complete so projections (fields) are ignored
+class GraphFinder(Finder):
+    def __init__(self, db_instance: DbFile) -> None:
+        super().__init__(db_instance)
+
+        self.ach_defs: Dict[Any, AchievementDefinition] = {}
+        self.ach_defs_by_ext: Dict[Any, AchievementDefinition] = {}
+        self.ach_defs_by_game_ids: Dict[Any, List[AchievementDefinition]] = {}
+        self.ach_insts: Dict[Any, AchievementInstance] = {}
+        self.ach_insts_by_def: Dict[Any, AchievementInstance] = {}
+        self.ccs: Dict[Any, ClientContext] = {}
+        self.ccs_by_package: Dict[Any, ClientContext] = {}
+        self.game_insts: Dict[Any, GameInstance] = {}
+        self.game_insts_by_game: Dict[Any, GameInstance] = {}
+        self.game_insts_by_game_installed: Dict[Any, GameInstance] = {}
+        self.game_insts_by_package: Dict[Any, GameInstance] = {}
+        self.games: Dict[Any, Game] = {}
+        self.games_by_ext: Dict[Any, Game] = {}
+
+        self.reload()
+
+    def reload(self) -> None:
+        # rows come ordered by _id, setdefault keeps the first match like select_by_cls_fe does
+        for d in self.db.select_by_cls(AchievementDefinition):
+            self.ach_defs[d.id] = d
+            self.ach_defs_by_ext.setdefault(str_key(d.external_achievement_id), d)
+            self.ach_defs_by_game_ids.setdefault(d.game_id, []).append(d)
+
+        for i in self.db.select_by_cls(AchievementInstance):
+            self.ach_insts[i.id] = i
+            self.ach_insts_by_def.setdefault(i.definition_id, i)
+
+        for c in self.db.select_by_cls(ClientContext):
+            self.ccs[c.id] = c
+            self.ccs_by_package.setdefault(str_key(c.package_name), c)
+
+        for gi in self.db.select_by_cls(GameInstance):
+            self.game_insts[gi.id] = gi
+            self.game_insts_by_game.setdefault(gi.instance_game_id, gi)
+            self.game_insts_by_package.setdefault(str_key(gi.package_name), gi)
+            if gi.installed == 1:
+                self.game_insts_by_game_installed.setdefault(gi.instance_game_id, gi)
+
+        for g in self.db.select_by_cls(Game):
+            self.games[g.id] = g
+            self.games_by_ext.setdefault(str_key(g.external_game_id), g)
+
+    def ach_def_by_id(self, x: Any) -> Optional[AchievementDefinition]:
+        return self.ach_defs.get(int_key(x))
+
+    def ach_def_by_external_id(self, x: Any) -> Optional[AchievementDefinition]:
+        return self.ach_defs_by_ext.get(str_key(x))
+
+    def ach_inst_by_id(self, x: Any) -> Optional[AchievementInstance]:
+        return self.ach_insts.get(int_key(x))
+
+    def client_context_by_id(self, x: Any) -> Optional[ClientContext]:
+        return self.ccs.get(int_key(x))
+
+    def game_inst_by_id(self, x: Any) -> Optional[GameInstance]:
+        return self.game_insts.get(int_key(x))
+
+    def game_by_id(self, x: Any) -> Optional[Game]:
+        return self.games.get(int_key(x))
+
+    def ach_def_by_ach_inst(self, x: AchievementInstance) -> Optional[AchievementDefinition]:
+        return self.ach_defs.get(x.definition_id)
+
+    def ach_defs_by_ach_insts(self, x: List[AchievementInstance]) -> List[Optional[AchievementDefinition]]:
+        return [self.ach_def_by_ach_inst(y) for y in x]
+
+    def ach_defs_by_external_ids(self, x: List[Any]) -> List[Optional[AchievementDefinition]]:
+        return [self.ach_def_by_external_id(y) for y in x]
+
+    def game_inst_by_game(self, x: Game) -> Optional[GameInstance]:
+        return self.game_insts_by_game_installed.get(x.id)
+
+    def game_insts_by_games(self, x: List[Optional[Game]], fields: List[str]=None) -> List[Optional[GameInstance]]:
+        return [self.game_inst_by_game(y) if y else None for y in x]
+
+    def game_inst_by_game_id(self, x: Any) -> Optional[GameInstance]:
+        return self.game_insts_by_game.get(int_key(x))
+
+    def game_inst_by_package_name(self, x: str) -> Optional[GameInstance]:
+        return self.game_insts_by_package.get(str_key(x))
+
+    def game_insts_by_package_names(self, x: List[str], fields: List[str]=None) -> List[Optional[GameInstance]]:
+        return [self.game_inst_by_package_name(y) for y in x]
+
+    def game_by_game_inst(self, x: GameInstance) -> Optional[Game]:
+        return self.games.get(x.instance_game_id)
+
+    def games_by_game_insts(self, x: List[Optional[GameInstance]], fields: List[str]=None) -> List[Optional[Game]]:
+        return [self.game_by_game_inst(y) if y else None for y in x]
+
+    def game_by_external_id(self, x: Any) -> Optional[Game]:
+        return self.games_by_ext.get(str_key(x))
+
+    def games_by_ids(self, x: List[Any], fields: List[str]=None) -> List[Optional[Game]]:
+        return [self.game_by_id(y) for y in x]
+
+    def game_by_ach_inst(self, x: AchievementInstance) -> Optional[Game]:
+        udef = self.ach_def_by_ach_inst(x)
+        return self.game_by_ach_def(udef) if udef else None
+
+    def game_by_ach_def(self, x: AchievementDefinition) -> Optional[Game]:
+        return self.games.get(x.game_id)
+
+    def games_by_ach_defs(self, x: List[AchievementDefinition]) -> List[Optional[Game]]:
+        return [self.game_by_ach_def(y) for y in x]
+
+    def ach_defs_by_game_id(self, x: Any, fields: List[str]=None) -> List[Optional[AchievementDefinition]]:
+        return list(self.ach_defs_by_game_ids.get(int_key(x), []))
+
+    def ach_defs_by_games(self, x: List[Optional[Game]], fields: List[str]=None) -> List[List[AchievementDefinition]]:
+        return [self.ach_defs_by_game_id(y.id) if y else [] for y in x]
+
+    def ach_inst_by_ach_def(self, x: AchievementDefinition) -> Optional[AchievementInstance]:
+        return self.ach_insts_by_def.get(x.id)
+
+    def ach_insts_by_ach_defs(self, x: List[AchievementDefinition], fields: List[str]=None) -> List[Optional[AchievementInstance]]:
+        return [self.ach_inst_by_ach_def(y) for y in x]
+
+    def client_context_by_game_inst(self, x: GameInstance) -> Optional[ClientContext]:
+        return self.ccs_by_package.get(str_key(x.package_name))
+
+    def client_contexts_by_game_insts(self, x: List[Optional[GameInstance]]) -> List[Optional[ClientContext]]:
+        return [self.client_context_by_game_inst(y) if y else None for y in x]
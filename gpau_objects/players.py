@@ -0,0 +1,76 @@
+import os
+import json
+from gpau_objects.structure import Player
+from gpau_objects.dbfile import DbFile
+from gpau_objects.common import cache_dir, file_signature
+from typing import Dict, List, Optional, Any
+
+class PlayerManifest:
+    # first player of every account db, valid while the file's mtime/size don't change
+    file_name = "players.json"
+    max_workers = 8
+
+    def __init__(self, path: Optional[str]=None) -> None:
+        self.path = path or os.path.join(cache_dir(), self.file_name)
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.changed = False
+
+        try:
+            with open(self.path) as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def get(self, file: str) -> Optional[Player]:
+        entry = self.entries.get(os.path.abspath(file))
+        if not entry or entry["signature"] != file_signature(file):
+            return None
+        return Player(*[entry["player"].get(x) for x in Player.fields()])
+
+    def put(self, file: str, player: Player) -> None:
+        self.entries[os.path.abspath(file)] = {"signature": file_signature(file), "player": player.dict()}
+        self.changed = True
+
+    def save(self) -> None:
+        if not self.changed:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path + ".tmp", "w") as f:
+                # blobs aren't needed to list players, they're stored as null
+                json.dump(self.entries, f, default=lambda x: None)
+            os.replace(self.path + ".tmp", self.path)
+            self.changed = False
+        except OSError:
+            # the cache is optional, a read-only location only costs the next run a rescan
+            pass
+
+def read_player(file: str) -> Optional[Player]:
+    try:
+        db = DbFile.open(file, readonly=True)
+    except Exception:
+        return None
+    try:
+        return db.select_first(Player)
+    except (Exception, SystemExit):
+        # not a GMS games db (no players table), DbFile already logged why
+        return None
+    finally:
+        db.close()
+
+def find_players(files: List[str], manifest: Optional[PlayerManifest]=None) -> Dict[str, Player]:
+    manifest = manifest or PlayerManifest()
+    found = {x: manifest.get(x) for x in files}
+    missing = [x for x, y in found.items() if y is None]
+
+    if missing:
+        # concurrent.futures pulls in logging, only paid when a file has to be read
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=min(PlayerManifest.max_workers, len(missing))) as pool:
+            for file, player in zip(missing, pool.map(read_player, missing)):
+                found[file] = player
+                if player is not None:
+                    manifest.put(file, player)
+        manifest.save()
+
+    return {x: y for x, y in found.items() if y is not None}
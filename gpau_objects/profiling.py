@@ -0,0 +1,118 @@
+import os
+import time
+import pstats
+import cProfile
+import tracemalloc
+from gpau_objects import decoder
+from gpau_objects.common import Logger
+from typing import Any, Callable, Dict, List, Tuple
+
+# --profile: runs a command under cProfile and tracemalloc, writes the .pstats
+# (`python -m pstats file`, snakeviz, ...) and logs the top functions by
+# cumulative time, the top allocation sites and the time per phase. The phases
+# are the self time of every profiled function, bucketed by where it lives.
+# Stepping a cursor in a for loop isn't a call cProfile sees, that sqlite time
+# lands in the function running the loop (decode, mostly). Builtins, genexprs
+# and other nested code count for the phase of the function that called them.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# the output of the listings, whichever of our files it's in
+RENDER_FUNCTIONS = {"print_string", "join", "dump", "__repr__", "emit", "report", "print_games",
+                    "<built-in method builtins.print>"}
+
+# first match wins, the rest is "other"
+PHASES: List[Tuple[str, Callable[[str, str], bool]]] = [
+    ("discovery", lambda file, func: os.path.basename(file) in ("players.py", "accounts.py", "glob.py", "fnmatch.py")
+                                     or func in ("get_db_files", "resolve_input")),
+    ("connection", lambda file, func: "_sqlite3.connect" in func or "'backup'" in func
+                                      or (os.path.basename(file) == "dbfile.py" and func == "open")),
+    # casefold is the sql function of the name searches, sqlite calls it while stepping
+    ("query", lambda file, func: "sqlite3." in func or os.path.basename(file) in ("query.py", "search.py", "fuzzy.py")
+                                 or (os.path.basename(file) == "dbfile.py" and func == "casefold")),
+    ("render", lambda file, func: (func in RENDER_FUNCTIONS and (file == "~" or os.path.abspath(file).startswith(ROOT + os.sep)))
+                                  or os.path.basename(file) in ("nicecli.py", "common.py")
+                                  or "terminaltables" in file),
+    ("decode", lambda file, func: file == decoder.filename
+                                  or os.path.basename(file) in ("dbfile.py", "structure.py", "graph.py", "decoder.py")),
+]
+
+def phase_of(file: str, func: str) -> str:
+    for name, matches in PHASES:
+        if matches(file, func):
+            return name
+    return "other"
+
+def nested(file: str, func: str, phase: str) -> bool:
+    # builtins no phase names (str.join, sorted, ...) and the <genexpr>/<listcomp>/<lambda>
+    # code inside a function
+    return phase == "other" if file == "~" else func.startswith("<")
+
+def location(key: Tuple[str, int, str]) -> str:
+    file, line, func = key
+    return func if file == "~" else f"{os.path.basename(file)}:{line}({func})"
+
+class Profile:
+    # rows of every listing in the report
+    top = 15
+    # frames kept per allocation, 1 is enough to name the line
+    frames = 1
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        # cpu the interpreter spent on starting up and importing before the command
+        startup = time.process_time()
+        profiler = cProfile.Profile()
+        tracemalloc.start(self.frames)
+        start = time.perf_counter()
+        try:
+            return profiler.runcall(fn, *args)
+        finally:
+            elapsed = time.perf_counter() - start
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            self.report(profiler, snapshot, startup, elapsed, peak)
+
+    def report(self, profiler: cProfile.Profile, snapshot: tracemalloc.Snapshot, startup: float, elapsed: float, peak: int) -> None:
+        stats = pstats.Stats(profiler)
+        try:
+            stats.dump_stats(self.path)
+            written = f", written to {self.path}"
+        except OSError as e:
+            written = f", can't write {self.path}: {e}"
+
+        Logger.info(f"Profile: {elapsed:.3f}s, peak traced memory {peak / 1024 / 1024:.1f} MiB{written}")
+
+        def resolve(key: Tuple[str, int, str], depth: int=0) -> str:
+            # nested code counts for the phase of the function that called it most
+            file, _, func = key
+            phase = phase_of(file, func)
+            callers = stats.stats[key][4]  # type: ignore[attr-defined]
+            if nested(file, func, phase) and callers and depth < 8:
+                caller = max(callers.items(), key=lambda x: x[1][2])[0]
+                if caller in stats.stats:  # type: ignore[attr-defined]
+                    return resolve(caller, depth + 1)
+            return phase
+
+        phases: Dict[str, float] = {"startup": startup}
+        for key, (_, _, tottime, _, _) in stats.stats.items():  # type: ignore[attr-defined]
+            phase = resolve(key)
+            phases[phase] = phases.get(phase, 0.0) + tottime
+        Logger.info("Phases (startup is cpu time before the command):")
+        for name in ["startup", "discovery", "connection", "query", "decode", "render", "other"]:
+            Logger.info(f"  {name:<11} {phases.get(name, 0.0):>8.3f}s")
+
+        Logger.info("Top functions by cumulative time:")
+        Logger.info(f"  {'cumulative':>10} {'self':>8} {'calls':>8}  function")
+        functions = sorted(stats.stats.items(), key=lambda x: x[1][3], reverse=True)  # type: ignore[attr-defined]
+        for key, (_, calls, tottime, cumtime, _) in functions[:self.top]:
+            Logger.info(f"  {cumtime:>9.3f}s {tottime:>7.3f}s {calls:>8}  {location(key)}")
+
+        Logger.info("Top allocation sites (still allocated at the end):")
+        ignored = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen importlib._bootstrap*>")]
+        for stat in snapshot.filter_traces(ignored).statistics("lineno")[:self.top]:
+            frame = stat.traceback[0]
+            Logger.info(f"  {stat.size / 1024:>9.1f} KiB {stat.count:>8}  {os.path.basename(frame.filename)}:{frame.lineno}")
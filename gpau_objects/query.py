@@ -0,0 +1,71 @@
+from functools import lru_cache
+from typing import Optional, Tuple
+
+# Statements are cached by their shape (table, columns, flags), values are always
+# bound separately. Every lookup of the same shape hands sqlite the exact same
+# string, so the connection's statement cache (cached_statements) reuses the
+# already prepared statement instead of parsing a new one.
+
+STATEMENT_CACHE_SIZE = 256
+
+def projection(fields: Tuple[str, ...]) -> str:
+    return ",".join(fields) if fields else "*"
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def select_sql(table: str, cols: Tuple[str, ...], exact: bool, fields: Tuple[str, ...]=()) -> str:
+    sql = f"select {projection(fields)} from {table} where 1=1"
+    for c in cols:
+        sql += f" and {c}=?" if exact else f" and {c} like ?"
+    return sql + " order by _id"
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def search_sql(table: str, cols: Tuple[str, ...], exact: bool, fields: Tuple[str, ...]=()) -> str:
+    sql = f"select {projection(fields)} from {table} where (1=0"
+    for c in cols:
+        sql += f" or lower({c})=?" if exact else f" or lower({c}) like ?"
+    return sql + ") order by _id"
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def select_in_sql(table: str, col: str, count: int, cols: Tuple[str, ...], fields: Tuple[str, ...]=()) -> str:
+    sql = f"select {projection(fields)} from {table} where {col} in ({','.join('?' for _ in range(count))})"
+    for c in cols:
+        sql += f" and {c}=?"
+    return sql + " order by _id"
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def achievements_sql(search: str, game: bool, states: Optional[Tuple[bool, bool]], types: Tuple[bool, bool, bool]) -> str:
+    # one statement for every find_achievements variant, binds in this order:
+    #   search "ids": json array of ranked _ids, "like": the casefold()ed needle twice, "": nothing
+    #   game: game _id
+    # states is (unlocked, locked) and needs the achievement's (first) instance,
+    # None lists definitions with or without one. types is (nor, inc, sec).
+    sql = "select d.* from achievement_definitions d"
+    if search == "ids":
+        sql += " join json_each(?) r on r.value = d._id"
+    if states is not None:
+        sql += " join (select definition_id, state, min(_id) from achievement_instances group by definition_id) i on i.definition_id = d._id"
+
+    where = []
+    if search == "like":
+        where.append("(instr(casefold(d.name), ?) > 0 or instr(casefold(d.description), ?) > 0)")
+    if game:
+        where.append("d.game_id = ?")
+    if states is not None:
+        where.append("(" + " or ".join([x for x, y in zip(["i.state = 0", "i.state > 0"], states) if y] or ["0"]) + ")")
+    if not all(types):
+        where.append("(" + " or ".join([x for x, y in zip(["d.type = 0", "d.type = 1", "d.initial_state = 2"], types) if y] or ["0"]) + ")")
+
+    if where:
+        sql += " where " + " and ".join(where)
+    return sql + (" order by r.key" if search == "ids" else " order by d._id")
+
+def like_value(value: object) -> str:
+    return f"%{value}%"
+
+def cache_info() -> dict:
+    return {
+        "select": select_sql.cache_info()._asdict(),
+        "search": search_sql.cache_info()._asdict(),
+        "select_in": select_in_sql.cache_info()._asdict(),
+        "achievements": achievements_sql.cache_info()._asdict(),
+    }
@@ -0,0 +1,21 @@
+# shown by --readme, kept apart so printing it doesn't load the db code
+readme_text = """
+HOW TO USE?
+1) Disconnect from the internet
+2) Unlock the achievements you want
+3) Reconnect to the internet
+4) Run Google Play Games to sync the achievements
+5) Profit
+
+ACHIEVEMENT FLAGS?
+NOR - normal
+INC - incremental
+SEC - secret
+
+GAME WON'T APPEAR IN --list-cc? Try one of these:
+1) Play the game for a couple of minutes
+2) In-app button to logout and login again
+3) Earn any achievement
+4) Re/Open Google Play App
+5) Clear Cache/All data and login again
+6) Restart phone\n"""
@@ -0,0 +1,128 @@
+import os
+import json
+import zlib
+import sqlite3
+import hashlib
+from gpau_objects.common import Logger, cache_dir, file_signature
+from gpau_objects.dbfile import DbFile
+from typing import Dict, List, Optional, Tuple
+
+# Sidecar FTS5 index for the name searches, stored in the cache dir, one file
+# per source db. The trigram tokenizer matches any substring of 3+ characters
+# case-insensitively, the same as the `in`/`like '%x%'` scans it replaces, but
+# through the index and ranked by bm25. The index is synced whenever the source
+# db's mtime/size changed, only rows whose text changed are rewritten.
+# Searches it can't answer (shorter than 3 characters, sqlite without fts5
+# trigram, cache dir not writable) return None and the caller scans instead.
+
+class SearchIndex:
+    version = 1
+    # trigrams need at least 3 characters to match anything
+    min_length = 3
+
+    # indexed columns of every table and their bm25 weights
+    sources: Dict[str, List[Tuple[str, float]]] = {
+        "achievement_definitions": [("name", 10.0), ("description", 1.0)],
+        "games": [("display_name", 10.0), ("developer_name", 5.0), ("external_game_id", 1.0), ("game_description", 1.0)],
+    }
+
+    def __init__(self, db: DbFile, file: str, path: Optional[str]=None) -> None:
+        self.db = db
+        self.file = os.path.abspath(file)
+        name = hashlib.sha1(self.file.encode()).hexdigest()[:16]
+        self.path = path or os.path.join(cache_dir(), f"search_{name}.db")
+        self.connection: Optional[sqlite3.Connection] = None
+        self.broken = False
+
+    def search(self, table: str, text: str) -> Optional[List[int]]:
+        # _ids of the matching rows, best match first
+        if len(text) < self.min_length or not self.sync():
+            return None
+
+        assert self.connection is not None
+        weights = ",".join(str(w) for _, w in self.sources[table])
+        phrase = '"' + text.replace('"', '""') + '"'
+        rows = self.connection.execute(
+            f"select rowid from fts_{table} where fts_{table} match ? order by bm25(fts_{table}, {weights}), rowid",
+            [phrase]).fetchall()
+        return [x[0] for x in rows]
+
+    def close(self) -> None:
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def sync(self) -> bool:
+        if self.broken:
+            return False
+
+        try:
+            if self.connection is None:
+                self.connection = self.open()
+
+            signature = json.dumps([self.version, file_signature(self.file)])
+            row = self.connection.execute("select value from meta where key = 'signature'").fetchone()
+            if row and row[0] == signature:
+                return True
+
+            with self.connection:
+                for table in self.sources:
+                    self.sync_table(table)
+                self.connection.execute("insert or replace into meta values ('signature', ?)", [signature])
+            return True
+        except (OSError, sqlite3.Error) as e:
+            # the index is only a shortcut, searches fall back to scanning
+            Logger.warning(f"Search index not available, scanning instead ({e})")
+            self.broken = True
+            self.close()
+            return False
+
+    def open(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        connection = sqlite3.connect(self.path)
+        connection.execute("create table if not exists meta (key text primary key, value text)")
+
+        row = connection.execute("select value from meta where key = 'version'").fetchone()
+        if row is None or row[0] != str(self.version):
+            # different layout, start over
+            for table in self.sources:
+                connection.execute(f"drop table if exists fts_{table}")
+                connection.execute(f"drop table if exists rows_{table}")
+            connection.execute("delete from meta")
+
+        for table, cols in self.sources.items():
+            names = ",".join(x for x, _ in cols)
+            connection.execute(f"create virtual table if not exists fts_{table} using fts5({names}, tokenize='trigram')")
+            connection.execute(f"create table if not exists rows_{table} (_id integer primary key, crc integer)")
+        connection.execute("insert or replace into meta values ('version', ?)", [str(self.version)])
+        connection.commit()
+        return connection
+
+    def sync_table(self, table: str) -> None:
+        assert self.connection is not None
+        cols = [x for x, _ in self.sources[table]]
+        cls = self.db.mapping[table]
+        # older GMS schemas may miss a column, it's indexed as empty then
+        available = [x for x in cols if x in self.db.columns(table)]
+
+        current: Dict[int, Tuple[int, List[Optional[str]]]] = {}
+        for obj in self.db.iter_by_cls(cls, fields=available):
+            values = [None if x not in available or getattr(obj, x) is None else str(getattr(obj, x)) for x in cols]
+            current[obj.id] = (zlib.crc32(repr(values).encode()), values)
+
+        stored = dict(self.connection.execute(f"select _id, crc from rows_{table}").fetchall())
+        changed = [x for x, (crc, _) in current.items() if stored.get(x) != crc]
+        removed = [x for x in stored if x not in current]
+
+        if not changed and not removed:
+            return
+
+        stale = [[x] for x in changed + removed]
+        self.connection.executemany(f"delete from fts_{table} where rowid = ?", stale)
+        self.connection.executemany(f"delete from rows_{table} where _id = ?", stale)
+        self.connection.executemany(
+            f"insert into fts_{table} (rowid, {','.join(cols)}) values (?{',?' * len(cols)})",
+            [[x] + current[x][1] for x in changed])
+        self.connection.executemany(
+            f"insert into rows_{table} values (?, ?)",
+            [[x, current[x][0]] for x in changed])
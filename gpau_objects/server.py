@@ -0,0 +1,157 @@
+import io
+import os
+import sys
+import json
+import time
+import traceback
+import socket
+import argparse
+import contextlib
+from gpau_objects.common import Logger, file_signature
+from gpau_objects.gpau import GooglePlayAchievementUnlocker
+from typing import Any, Dict, List, Optional
+
+# Keeps one GooglePlayAchievementUnlocker resident with its connection and Finder
+# caches warm, and runs gpau.py command lines sent over a unix socket.
+# One request per line, {"argv": [...]}, answered by one line
+# {"code": exit code, "output": everything the command printed, "time": seconds}.
+# Commands run one after another, a sqlite connection stays on its own thread.
+
+class Server:
+    # options that only make sense for the process itself
+    session_options = ["serve", "batch", "all_players", "profile"]
+
+    def __init__(self, path: str, parser: argparse.ArgumentParser, args: Any) -> None:
+        self.path = path
+        self.parser = parser
+        self.args = args
+        self.gpau: Optional[GooglePlayAchievementUnlocker] = None
+        self.signature: Optional[List[int]] = None
+        self.running = False
+
+    def serve_forever(self) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        if os.path.exists(self.path):
+            if answers(self.path):
+                Logger.error_exit(f"A server is already running on {self.path}")
+            # left behind by a server that didn't shut down
+            os.remove(self.path)
+
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # the socket file is created 0600, other users never get a window to connect
+        umask = os.umask(0o177)
+        try:
+            sock.bind(self.path)
+        finally:
+            os.umask(umask)
+        sock.listen(8)
+        Logger.info(f"Serving on {self.path}")
+
+        self.running = True
+        try:
+            while self.running:
+                conn, _ = sock.accept()
+                with conn, conn.makefile("rwb") as f:
+                    for line in f:
+                        f.write(json.dumps(self.handle(line)).encode() + b"\n")
+                        f.flush()
+                        if not self.running:
+                            break
+        except KeyboardInterrupt:
+            pass
+        finally:
+            sock.close()
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            if self.gpau is not None:
+                self.gpau.db.close()
+
+    def handle(self, line: bytes) -> Dict[str, Any]:
+        start = time.perf_counter()
+        try:
+            request = json.loads(line)
+        except ValueError:
+            return {"code": 2, "output": "Request is not valid JSON\n", "time": 0.0}
+
+        if request.get("shutdown"):
+            self.running = False
+            return {"code": 0, "output": "", "time": 0.0}
+
+        out = io.StringIO()
+        code = 0
+        failure = None
+        with contextlib.redirect_stdout(out), contextlib.redirect_stderr(out), replace_stdin():
+            try:
+                self.run(request.get("argv") or [])
+            except SystemExit as e:
+                # sys.exit() is a success, sys.exit("message") a failure
+                code = e.code if isinstance(e.code, int) else 0 if e.code is None else 1
+            except Exception:
+                # a bug in one command must not take the server down, the client
+                # gets the traceback and the next command starts on a new session
+                code = 1
+                failure = traceback.format_exc()
+                Logger.critical(f"Command failed:\n{failure}")
+                self.drop_session()
+
+        if failure is not None:
+            Logger.error(f"Command {request.get('argv')} failed: {failure.splitlines()[-1]}")
+
+        return {"code": code, "output": out.getvalue(), "time": time.perf_counter() - start}
+
+    def run(self, argv: List[str]) -> None:
+        if not argv:
+            self.parser.print_help()
+            raise SystemExit(1)
+
+        args = GooglePlayAchievementUnlocker.command_args(self.parser, argv, self.args, self.session_options)
+
+        # the server's own -i applies unless the command picks an account
+        if args.input is None and args.player is None:
+            args.input = self.args.input
+
+        self.session(args).run()
+        self.signature = file_signature(self.gpau.args.input)
+
+    def drop_session(self) -> None:
+        # the connection may be left mid transaction and the caches half filled
+        if self.gpau is not None and self.gpau.inst_db is not None:
+            with contextlib.suppress(Exception):
+                self.gpau.inst_db.close()
+        self.gpau = None
+        self.signature = None
+
+    def session(self, args: Any) -> GooglePlayAchievementUnlocker:
+        g = self.gpau
+        if g is None:
+            self.gpau = GooglePlayAchievementUnlocker(args)
+            return self.gpau
+
+        current = (g.args.input, g.args.preload, g.args.snapshot)
+        g.args = args
+        g.resolve_input()
+
+        # another account, other load options or the db was written by someone
+        # else (GMS syncing) since the last command, cached rows can't be trusted
+        if (args.input, args.preload, args.snapshot) != current or file_signature(args.input) != self.signature:
+            g.reopen()
+        return g
+
+def answers(path: str) -> bool:
+    # a stale socket file refuses the connection
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(path)
+            return True
+        except OSError:
+            return False
+
+@contextlib.contextmanager
+def replace_stdin():
+    # commands can't prompt, reading steps for incremental achievements gets EOF
+    stdin = sys.stdin
+    sys.stdin = io.StringIO("")
+    try:
+        yield
+    finally:
+        sys.stdin = stdin
@@ -0,0 +1,88 @@
+import re
+import json
+from gpau_objects.common import Logger
+from sqlite3 import Connection
+from typing import Any, Dict, List, Optional, Sequence
+
+# Collects what every DbFile statement cost: statements are grouped by shape
+# (whitespace collapsed, `in (?,?,?)` lists folded) so the chunks of one batched
+# lookup count as one shape. Statements slower than slow_threshold get their
+# EXPLAIN QUERY PLAN captured, plans that scan a whole table are reported.
+
+def shape(sql: str) -> str:
+    sql = re.sub(r"\s+", " ", sql).strip()
+    return re.sub(r"\?(?:\s*,\s*\?)+", "?...", sql)
+
+def is_full_scan(detail: str) -> bool:
+    # "SCAN games" reads every row, "SCAN games USING INDEX ..." walks an index,
+    # virtual tables (json_each, fts) decide on their own
+    return detail.startswith("SCAN ") and " USING " not in detail and " VIRTUAL TABLE " not in detail
+
+class QueryStats:
+    # seconds
+    slow_threshold = 0.005
+    # shapes in the summary
+    top = 10
+
+    def __init__(self) -> None:
+        self.shapes: Dict[str, Dict[str, Any]] = {}
+        self.slow: List[Dict[str, Any]] = []
+        self.reported = False
+
+    def record(self, connection: Connection, sql: str, params: Sequence[Any], rows: int, elapsed: float) -> None:
+        key = shape(sql)
+        entry = self.shapes.get(key)
+        if entry is None:
+            entry = self.shapes[key] = {"shape": key, "count": 0, "params": len(params), "rows": 0, "time": 0.0, "max": 0.0}
+        entry["count"] += 1
+        entry["rows"] += rows
+        entry["time"] += elapsed
+        entry["max"] = max(entry["max"], elapsed)
+
+        if elapsed >= self.slow_threshold and key not in [x["shape"] for x in self.slow]:
+            self.slow.append({"shape": key, "time": elapsed, "plan": self.plan(connection, sql, params)})
+
+    @staticmethod
+    def plan(connection: Connection, sql: str, params: Sequence[Any]) -> List[str]:
+        if not re.match(r"\s*(select|with|insert|update|delete)\b", sql, re.I):
+            return []
+        try:
+            return [x[3] for x in connection.execute("explain query plan " + sql, params).fetchall()]
+        except Exception as e:
+            return [f"no plan: {e}"]
+
+    def full_scans(self) -> List[Dict[str, str]]:
+        return [{"shape": x["shape"], "detail": y} for x in self.slow for y in x["plan"] if is_full_scan(y)]
+
+    def summary(self, extra: Optional[Dict[str, Any]]=None) -> Dict[str, Any]:
+        shapes = sorted(self.shapes.values(), key=lambda x: x["time"], reverse=True)
+        return {
+            "queries": sum(x["count"] for x in shapes),
+            "rows": sum(x["rows"] for x in shapes),
+            "time": sum(x["time"] for x in shapes),
+            "shapes": len(shapes),
+            "top": shapes[:self.top],
+            "slow": self.slow,
+            "full_scans": self.full_scans(),
+            **(extra or {}),
+        }
+
+    def report(self, fmt: str="text", extra: Optional[Dict[str, Any]]=None) -> None:
+        self.reported = True
+        summary = self.summary(extra)
+
+        if fmt == "json":
+            print(json.dumps(summary))
+            return
+
+        Logger.info(f"Queries: {summary['queries']} ({summary['shapes']} shapes), {summary['rows']} rows in {summary['time'] * 1000:.2f}ms")
+        for x in summary["top"]:
+            Logger.info(f"  {x['count']:>5}x {x['time'] * 1000:>8.2f}ms {x['rows']:>7} rows  {x['shape']}")
+        for x in summary["slow"]:
+            Logger.warning(f"Slow ({x['time'] * 1000:.2f}ms): {x['shape']}")
+            for detail in x["plan"]:
+                Logger.warning(f"  plan: {detail}")
+        for x in summary["full_scans"]:
+            Logger.warning(f"Full scan ({x['detail']}): {x['shape']}")
+        for name, value in (extra or {}).items():
+            Logger.info(f"{name}: {value}")
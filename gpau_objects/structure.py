@@ -1,15 +1,30 @@
 from __future__ import annotations
 import os
 from datetime import datetime
-from inspect import getframeinfo, stack
-from typing import List, Any, Optional, Dict, Callable
+from operator import attrgetter
+from collections import OrderedDict
+from typing import TYPE_CHECKING, List, Any, Optional, Dict, Callable, Tuple
+
+if TYPE_CHECKING:
+    from gpau_objects.dbfile import DbFile
 
 class Dummy:
     input: Optional[str] = None
     readme: bool = False
     auto_inc_achs: bool = False
     rem_dup_ops: bool = False
+    dup_key: Optional[str] = None
     rem_all_ops: bool = False
+    compact_ops: bool = False
+    preload: bool = False
+    snapshot: bool = False
+    cache_info: bool = False
+    stats: Optional[str] = None
+    profile: Optional[str] = None
+    serve: Optional[str] = None
+    batch: Optional[str] = None
+    batch_tx: str = "batch"
+    fuzzy: bool = False
 
     # package
     app: Optional[str] = None
@@ -17,6 +32,7 @@ class Dummy:
 
     # player
     player: Optional[str] = None
+    all_players: bool = False
 
     # listing
     list_cc: bool = False
@@ -47,29 +63,59 @@ class Dummy:
     unlock_listed: bool = False
 
 class Wrapper:
-    _id: Optional[int] = None
+    # field names in column order, subclasses use them as their __slots__
+    _fields: Tuple[str, ...] = ()
     _changers: Dict[str, Callable] = {}
-    _args: List[Any] = []
 
-    _hidden_attrs: List[str] = [
-        "_changers",
-        "_args",
-        "_hidden_attrs"
-    ]
+    # the columns a projected query selected, None when every field is set
+    __slots__ = ("_projection",)
 
-    def __init__(self, *args) -> None:
-        self._args = args
+    def __init_subclass__(cls, **kwargs) -> None:
+        super().__init_subclass__(**kwargs)
+        # values() of a full record in one call, attrgetter only returns a tuple for 2+ names
+        fields = cls._fields
+        cls._getter = attrgetter(*fields) if len(fields) > 1 else lambda obj: tuple(getattr(obj, x) for x in fields)
 
-    def attrs(self) -> List[str]:
-        return [x for x in self.__dict__ if not x.startswith("__") and not x.endswith("__") and x not in self._hidden_attrs]
+    def __init__(self, *args) -> None:
+        self._projection = None
+        n = len(args)
+        for i, name in enumerate(self._fields):
+            setattr(self, name, args[i] if i < n else None)
+
+    @classmethod
+    def fields(cls) -> Tuple[str, ...]:
+        return cls._fields
+
+    @classmethod
+    def partial(cls, fields: Tuple[str, ...], row: Tuple[Any, ...]) -> Wrapper:
+        # only the projected columns are set, the rest raise on access (see __getattr__)
+        obj = cls.__new__(cls)
+        for name, value in zip(fields, row):
+            setattr(obj, name, value)
+        obj._projection = fields
+        return obj
+
+    def __getattr__(self, name: str) -> Any:
+        # reached only for fields that were never set
+        if name != "_projection" and name in self._fields and self._projection is not None:
+            cls = self.__class__.__name__
+            raise AttributeError(f"{cls}.{name} was not loaded, the query only selected: {', '.join(self._projection)}")
+        raise AttributeError(f"'{self.__class__.__name__}' object has no attribute '{name}'")
+
+    def attrs(self) -> Tuple[str, ...]:
+        return self._fields if self._projection is None else self._projection
 
     def values(self) -> List[Any]:
-        return [getattr(self, x) for x in self.attrs()]
+        if self._projection is None:
+            return list(self._getter(self))
+        return [getattr(self, x) for x in self._projection]
 
     def dict(self) -> Dict[str, Any]:
-        return {x: getattr(self, x) for x in self.attrs()}
+        return dict(zip(self.attrs(), self.values()))
 
     def dump(self, changers=None) -> None:
+        # debugging only, inspect is slow to import
+        from inspect import getframeinfo, stack
         caller = getframeinfo(stack()[1][0])
         fname, line = caller.filename, caller.lineno
         fname = os.path.relpath(fname, os.getcwd())
@@ -79,9 +125,6 @@ class Wrapper:
         name = self.__class__.__name__
         print(f"{fname}:{line}:{name}:\n\t{dmp}")
 
-    def get_arg(self, index: int, lst: List[Any]) -> Any:
-        return lst[index] if index < len(lst) else None
-
     @staticmethod
     def join(*args, sep=" : ") -> str:
         return sep.join(str(x) for x in args)
@@ -98,31 +141,27 @@ class Wrapper:
         for n, f in self._changers.items():
             if n in d and n in changers:
                 d[n] = f(d[n])
+        if self._projection is not None:
+            return self.partial(self._projection, tuple(d.values()))
         return self.__class__(*list(d.values()))
 
     def __repr__(self) -> str:
         ps = getattr(self, "print_string", None)
         nm = self.__class__.__name__
-        return f"<{nm} '{ps() if ps else self.id}'>"
+        try:
+            return f"<{nm} '{ps() if ps else self.id}'>"
+        except AttributeError:
+            # partially loaded, print_string needs a column that wasn't selected
+            return f"<{nm} '{self.id}'>"
 
 class AchievementDefinition(Wrapper):
-    def __init__(self, *args) -> None:
-        super().__init__(*args)
-
-        self._id = self.get_arg(0, args)
-        self.game_id = self.get_arg(1, args)
-        self.external_achievement_id = self.get_arg(2, args)
-        self.type = self.get_arg(3, args)
-        self.name = self.get_arg(4, args)
-        self.description = self.get_arg(5, args)
-        self.unlocked_icon_image_id = self.get_arg(6, args)
-        self.revealed_icon_image_id = self.get_arg(7, args)
-        self.total_steps = self.get_arg(8, args)
-        self.formatted_total_steps = self.get_arg(9, args)
-        self.initial_state = self.get_arg(10, args)
-        self.sorting_rank = self.get_arg(11, args)
-        self.definition_xp_value = self.get_arg(12, args)
-        self.rarity_percent = self.get_arg(13, args)
+    _fields = (
+        "_id", "game_id", "external_achievement_id", "type", "name", "description",
+        "unlocked_icon_image_id", "revealed_icon_image_id", "total_steps",
+        "formatted_total_steps", "initial_state", "sorting_rank", "definition_xp_value",
+        "rarity_percent",
+    )
+    __slots__ = _fields
 
     def is_normal(self):
         return self.type == 0
@@ -143,21 +182,15 @@ class AchievementDefinition(Wrapper):
         return self.join(typ, self.external_achievement_id, name, desc, f"{self.definition_xp_value}xp")
 
 class AchievementInstance(Wrapper):
-    def __init__(self, *args) -> None:
-        super().__init__(*args)
-
-        self._changers = {
-            "last_updated_timestamp": lambda x: datetime.fromtimestamp(x / 1000)
-        }
+    _fields = (
+        "_id", "definition_id", "player_id", "state", "current_steps",
+        "formatted_current_steps", "last_updated_timestamp", "instance_xp_value",
+    )
+    __slots__ = _fields
 
-        self._id = self.get_arg(0, args)
-        self.definition_id = self.get_arg(1, args)
-        self.player_id = self.get_arg(2, args)
-        self.state = self.get_arg(3, args)
-        self.current_steps = self.get_arg(4, args)
-        self.formatted_current_steps = self.get_arg(5, args)
-        self.last_updated_timestamp = self.get_arg(6, args)
-        self.instance_xp_value = self.get_arg(7, args)
+    _changers = {
+        "last_updated_timestamp": lambda x: datetime.fromtimestamp(x / 1000)
+    }
 
     def is_unlocked(self) -> bool:
         return self.state == 0
@@ -169,231 +202,210 @@ class AchievementInstance(Wrapper):
         return self.join(self.definition_id, self.state, self.current_steps, self.instance_xp_value)
 
 class AchievementPendingOp(Wrapper):
-    def __init__(self, *args) -> None:
-        super().__init__(*args)
-
-        self._id = self.get_arg(0, args)
-        self.client_context_id = self.get_arg(1, args)
-        self.external_achievement_id = self.get_arg(2, args)
-        self.achievement_type = self.get_arg(3, args)
-        self.new_state = self.get_arg(4, args)
-        self.steps_to_increment = self.get_arg(5, args)
-        self.min_steps_to_set = self.get_arg(6, args)
-        self.external_game_id = self.get_arg(7, args)
-        self.external_player_id = self.get_arg(8, args)
+    _fields = (
+        "_id", "client_context_id", "external_achievement_id", "achievement_type",
+        "new_state", "steps_to_increment", "min_steps_to_set", "external_game_id",
+        "external_player_id",
+    )
+    __slots__ = _fields
 
     def print_string(self):
         return self.join(self.client_context_id, self.external_achievement_id, self.external_game_id, self.external_player_id)
 
 class ClientContext(Wrapper):
-    def __init__(self, *args) -> None:
-        super().__init__(*args)
+    _fields = (
+        "_id", "package_name", "package_uid", "account_name", "account_type",
+        "is_games_lite",
+    )
+    __slots__ = _fields
 
-        self._changers = {
-            "account_name": lambda x: x[0:2] + "*" * (len(x) - x.find("@") - 2) + x[x.find("@")-2:]
-        }
-
-        self._id = self.get_arg(0, args)
-        self.package_name = self.get_arg(1, args)
-        self.package_uid = self.get_arg(2, args)
-        self.account_name = self.get_arg(3, args)
-        self.account_type = self.get_arg(4, args)
-        self.is_games_lite = self.get_arg(5, args)
+    _changers = {
+        "account_name": lambda x: x[0:2] + "*" * (len(x) - x.find("@") - 2) + x[x.find("@")-2:]
+    }
 
     def print_string(self):
         return self.join(self.id, self.package_name)
 
 class GameInstance(Wrapper):
-    def __init__(self, *args) -> None:
-        super().__init__(*args)
-
-        self._id = self.get_arg(0, args)
-        self.instance_game_id = self.get_arg(1, args)
-        self.real_time_support = self.get_arg(2, args)
-        self.turn_based_support = self.get_arg(3, args)
-        self.platform_type = self.get_arg(4, args)
-        self.instance_display_name = self.get_arg(5, args)
-        self.package_name = self.get_arg(6, args)
-        self.piracy_check = self.get_arg(7, args)
-        self.installed = self.get_arg(8, args)
-        self.preferred = self.get_arg(9, args)
-        self.gamepad_support = self.get_arg(10, args)
+    _fields = (
+        "_id", "instance_game_id", "real_time_support", "turn_based_support",
+        "platform_type", "instance_display_name", "package_name", "piracy_check",
+        "installed", "preferred", "gamepad_support",
+    )
+    __slots__ = _fields
 
 
 class GamePlayerId(Wrapper):
-    def __init__(self, *args) -> None:
-        super().__init__(*args)
-
-        self._id = self.get_arg(0, args)
-        self.game_player_ids_external_player_id = self.get_arg(1, args)
-        self.game_player_ids_external_game_id = self.get_arg(2, args)
-        self.game_player_ids_external_game_player_id = self.get_arg(3, args)
-        self.game_player_ids_external_primary_player_id = self.get_arg(4, args)
-        self.game_player_ids_created_in_epoch = self.get_arg(5, args)
+    _fields = (
+        "_id", "game_player_ids_external_player_id", "game_player_ids_external_game_id",
+        "game_player_ids_external_game_player_id",
+        "game_player_ids_external_primary_player_id", "game_player_ids_created_in_epoch",
+    )
+    __slots__ = _fields
 
 
 class Game(Wrapper):
-    def __init__(self, *args) -> None:
-        super().__init__(*args)
-
-        self._id = self.get_arg(0, args)
-        self.external_game_id = self.get_arg(1, args)
-        self.display_name = self.get_arg(2, args)
-        self.primary_category = self.get_arg(3, args)
-        self.secondary_category = self.get_arg(4, args)
-        self.developer_name = self.get_arg(5, args)
-        self.game_description = self.get_arg(6, args)
-        self.game_icon_image_id = self.get_arg(7, args)
-        self.game_hi_res_image_id = self.get_arg(8, args)
-        self.featured_image_id = self.get_arg(9, args)
-        self.screenshot_image_ids = self.get_arg(10, args)
-        self.screenshot_image_widths = self.get_arg(11, args)
-        self.screenshot_image_heights = self.get_arg(12, args)
-        self.video_url = self.get_arg(13, args)
-        self.play_enabled_game = self.get_arg(14, args)
-        self.last_played_server_time = self.get_arg(15, args)
-        self.last_connection_local_time = self.get_arg(16, args)
-        self.last_synced_local_time = self.get_arg(17, args)
-        self.metadata_version = self.get_arg(18, args)
-        self.sync_token = self.get_arg(19, args)
-        self.metadata_sync_requested = self.get_arg(20, args)
-        self.target_instance = self.get_arg(21, args)
-        self.gameplay_acl_status = self.get_arg(22, args)
-        self.availability = self.get_arg(23, args)
-        self.owned = self.get_arg(24, args)
-        self.achievement_total_count = self.get_arg(25, args)
-        self.leaderboard_count = self.get_arg(26, args)
-        self.price_micros = self.get_arg(27, args)
-        self.formatted_price = self.get_arg(28, args)
-        self.full_price_micros = self.get_arg(29, args)
-        self.formatted_full_price = self.get_arg(30, args)
-        self.explanation = self.get_arg(31, args)
-        self.description_snippet = self.get_arg(32, args)
-        self.starRating = self.get_arg(33, args)
-        self.ratingsCount = self.get_arg(34, args)
-        self.muted = self.get_arg(35, args)
-        self.identity_sharing_confirmed = self.get_arg(36, args)
-        self.snapshots_enabled = self.get_arg(37, args)
-        self.theme_color = self.get_arg(38, args)
-        self.lastUpdatedTimestampMillis = self.get_arg(39, args)
+    _fields = (
+        "_id", "external_game_id", "display_name", "primary_category",
+        "secondary_category", "developer_name", "game_description", "game_icon_image_id",
+        "game_hi_res_image_id", "featured_image_id", "screenshot_image_ids",
+        "screenshot_image_widths", "screenshot_image_heights", "video_url",
+        "play_enabled_game", "last_played_server_time", "last_connection_local_time",
+        "last_synced_local_time", "metadata_version", "sync_token",
+        "metadata_sync_requested", "target_instance", "gameplay_acl_status",
+        "availability", "owned", "achievement_total_count", "leaderboard_count",
+        "price_micros", "formatted_price", "full_price_micros", "formatted_full_price",
+        "explanation", "description_snippet", "starRating", "ratingsCount", "muted",
+        "identity_sharing_confirmed", "snapshots_enabled", "theme_color",
+        "lastUpdatedTimestampMillis",
+    )
+    __slots__ = _fields
+
+    # columns print_string needs
+    print_fields: List[str] = ["external_game_id", "developer_name", "display_name"]
 
     def print_string(self, inst: Optional[GameInstance]=None):
         middle = self.developer_name if inst is None else inst.package_name
         return self.join(self.external_game_id, middle, self.display_name)
 
 class Image(Wrapper):
-    def __init__(self, *args) -> None:
-        super().__init__(*args)
-
-        self._id = self.get_arg(0, args)
-        self.url = self.get_arg(1, args)
-        self.local = self.get_arg(2, args)
-        self.filesize = self.get_arg(3, args)
-        self.download_timestamp = self.get_arg(4, args)
+    _fields = (
+        "_id", "url", "local", "filesize", "download_timestamp",
+    )
+    __slots__ = _fields
 
 class Player(Wrapper):
-    def __init__(self, *args) -> None:
-        super().__init__(*args)
-
-        self._id = self.get_arg(0, args)
-        self.external_player_id = self.get_arg(1, args)
-        self.profile_name = self.get_arg(2, args)
-        self.profile_icon_image_id = self.get_arg(3, args)
-        self.profile_hi_res_image_id = self.get_arg(4, args)
-        self.last_updated = self.get_arg(5, args)
-        self.is_in_circles = self.get_arg(6, args)
-        self.current_xp_total = self.get_arg(7, args)
-        self.current_level = self.get_arg(8, args)
-        self.current_level_min_xp = self.get_arg(9, args)
-        self.current_level_max_xp = self.get_arg(10, args)
-        self.next_level = self.get_arg(11, args)
-        self.next_level_max_xp = self.get_arg(12, args)
-        self.last_level_up_timestamp = self.get_arg(13, args)
-        self.player_title = self.get_arg(14, args)
-        self.has_all_public_acls = self.get_arg(15, args)
-        self.has_debug_access = self.get_arg(16, args)
-        self.is_profile_visible = self.get_arg(17, args)
-        self.most_recent_activity_timestamp = self.get_arg(18, args)
-        self.most_recent_external_game_id = self.get_arg(19, args)
-        self.most_recent_game_name = self.get_arg(20, args)
-        self.most_recent_game_icon_id = self.get_arg(21, args)
-        self.most_recent_game_hi_res_id = self.get_arg(22, args)
-        self.most_recent_game_featured_id = self.get_arg(23, args)
-        self.gamer_tag = self.get_arg(24, args)
-        self.real_name = self.get_arg(25, args)
-        self.banner_image_landscape_id = self.get_arg(26, args)
-        self.banner_image_portrait_id = self.get_arg(27, args)
-        self.total_unlocked_achievements = self.get_arg(28, args)
-        self.play_together_friend_status = self.get_arg(29, args)
-        self.play_together_nickname = self.get_arg(30, args)
-        self.play_together_invitation_nickname = self.get_arg(31, args)
-        self.profile_creation_timestamp = self.get_arg(32, args)
-        self.nickname_abuse_report_token = self.get_arg(33, args)
-        self.friends_list_visibility = self.get_arg(34, args)
-        self.always_auto_sign_in = self.get_arg(35, args)
+    _fields = (
+        "_id", "external_player_id", "profile_name", "profile_icon_image_id",
+        "profile_hi_res_image_id", "last_updated", "is_in_circles", "current_xp_total",
+        "current_level", "current_level_min_xp", "current_level_max_xp", "next_level",
+        "next_level_max_xp", "last_level_up_timestamp", "player_title",
+        "has_all_public_acls", "has_debug_access", "is_profile_visible",
+        "most_recent_activity_timestamp", "most_recent_external_game_id",
+        "most_recent_game_name", "most_recent_game_icon_id", "most_recent_game_hi_res_id",
+        "most_recent_game_featured_id", "gamer_tag", "real_name",
+        "banner_image_landscape_id", "banner_image_portrait_id",
+        "total_unlocked_achievements", "play_together_friend_status",
+        "play_together_nickname", "play_together_invitation_nickname",
+        "profile_creation_timestamp", "nickname_abuse_report_token",
+        "friends_list_visibility", "always_auto_sign_in",
+    )
+    __slots__ = _fields
 
     def print_string(self):
         return self.join(self.external_player_id, self.profile_name, f"Level {self.current_level}")
 
-
-from gpau_objects.dbfile import DbFile
-
 class Finder:
+    # entries of the identity map, least recently used ones are dropped first
+    cache_size: int = 4096
+
     def __init__(self, db_instance: DbFile) -> None:
+        self.cache: OrderedDict[Tuple[type, Tuple[str, ...], Tuple[Any, ...]], Any] = OrderedDict()
+        self.hits: int = 0
+        self.misses: int = 0
+        self.use_db(db_instance)
+
+    def use_db(self, db_instance: DbFile) -> None:
         self.db: DbFile = db_instance
+        self.db.on_write(self.invalidate)
+        self.cache.clear()
+
+    def first(self, cls: type, cols: List[str], values: List[Any]) -> Any:
+        # identity map in front of select_by_cls_fe, misses (None) are cached too
+        key = (cls, tuple(cols), tuple(values))
+        if key in self.cache:
+            self.hits += 1
+            self.cache.move_to_end(key)
+            return self.cache[key]
+
+        self.misses += 1
+        obj = self.db.select_by_cls_fe(cls, cols, values) if cols else self.db.select_first(cls)
+        self.cache[key] = obj
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return obj
+
+    def invalidate(self, table: str) -> None:
+        cls = self.db.mapping.get(table)
+        for key in [x for x in self.cache if x[0] is cls]:
+            del self.cache[key]
+
+    def cache_info(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self.cache), "maxsize": self.cache_size}
+
+    def player(self) -> Optional[Player]:
+        return self.first(Player, [], [])
 
     def ach_def_by_id(self, x: Any) -> Optional[AchievementDefinition]:
-        return self.db.select_by_cls_fe(AchievementDefinition, ["_id"], [x])
+        return self.first(AchievementDefinition, ["_id"], [x])
 
     def ach_def_by_external_id(self, x: Any) -> Optional[AchievementDefinition]:
-        return self.db.select_by_cls_fe(AchievementDefinition, ["external_achievement_id"], [x])
+        return self.first(AchievementDefinition, ["external_achievement_id"], [x])
 
     def ach_inst_by_id(self, x: Any) -> Optional[AchievementInstance]:
-        return self.db.select_by_cls_fe(AchievementInstance, ["_id"], [x])
+        return self.first(AchievementInstance, ["_id"], [x])
 
     def client_context_by_id(self, x: Any) -> Optional[ClientContext]:
-        return self.db.select_by_cls_fe(ClientContext, ["_id"], [x])
+        return self.first(ClientContext, ["_id"], [x])
 
     def game_inst_by_id(self, x: Any) -> Optional[GameInstance]:
-        return self.db.select_by_cls_fe(GameInstance, ["_id"], [x])
+        return self.first(GameInstance, ["_id"], [x])
 
     def game_player_id_by_id(self, x: Any) -> Optional[GamePlayerId]:
-        return self.db.select_by_cls_fe(GamePlayerId, ["_id"], [x])
+        return self.first(GamePlayerId, ["_id"], [x])
 
     def game_by_id(self, x: Any) -> Optional[Game]:
-        return self.db.select_by_cls_fe(Game, ["_id"], [x])
+        return self.first(Game, ["_id"], [x])
 
     def image_by_id(self, x: Any) -> Optional[Image]:
-        return self.db.select_by_cls_fe(Image, ["_id"], [x])
+        return self.first(Image, ["_id"], [x])
 
     def ach_def_by_ach_inst(self, x: AchievementInstance) -> Optional[AchievementDefinition]:
-        return self.db.select_by_cls_fe(AchievementDefinition, ["_id"], [x.definition_id])
+        return self.first(AchievementDefinition, ["_id"], [x.definition_id])
 
     def ach_defs_by_ach_insts(self, x: List[AchievementInstance]) -> List[Optional[AchievementDefinition]]:
-        return [self.ach_def_by_ach_inst(y) for y in x]
+        found = self.db.select_by_cls_in(AchievementDefinition, "_id", [y.definition_id for y in x])
+        return [found.get(y.definition_id) for y in x]
+
+    def ach_defs_by_external_ids(self, x: List[Any]) -> List[Optional[AchievementDefinition]]:
+        found = self.db.select_by_cls_in(AchievementDefinition, "external_achievement_id", x)
+        return [found.get(y) for y in x]
 
     def game_inst_by_game(self, x: Game) -> Optional[GameInstance]:
-        return self.db.select_by_cls_fe(GameInstance, ["instance_game_id", "installed"], [x.id, 1])
+        return self.first(GameInstance, ["instance_game_id", "installed"], [x.id, 1])
 
-    def game_insts_by_games(self, x: List[Game]) -> List[Optional[GameInstance]]:
-        return [self.game_inst_by_game(y) for y in x]
+    def game_insts_by_games(self, x: List[Optional[Game]], fields: List[str]=None) -> List[Optional[GameInstance]]:
+        found = self.db.select_by_cls_in(GameInstance, "instance_game_id", [y.id for y in x if y], ["installed"], [1], fields=fields)
+        return [found.get(y.id) if y else None for y in x]
 
     def game_inst_by_game_id(self, x: Any) -> Optional[GameInstance]:
-        return self.db.select_by_cls_fe(GameInstance, ["instance_game_id"], [x])
+        return self.first(GameInstance, ["instance_game_id"], [x])
 
     def game_inst_by_package_name(self, x: str) -> Optional[GameInstance]:
-        return self.db.select_by_cls_fe(GameInstance, ["package_name"], [x])
+        return self.first(GameInstance, ["package_name"], [x])
+
+    def game_insts_by_package_names(self, x: List[str], fields: List[str]=None) -> List[Optional[GameInstance]]:
+        found = self.db.select_by_cls_in(GameInstance, "package_name", x, fields=fields)
+        return [found.get(y) for y in x]
 
     def game_by_game_inst(self, x: GameInstance) -> Optional[Game]:
-        return self.db.select_by_cls_fe(Game, ["_id"], [x.instance_game_id])
+        return self.first(Game, ["_id"], [x.instance_game_id])
+
+    def games_by_game_insts(self, x: List[Optional[GameInstance]], fields: List[str]=None) -> List[Optional[Game]]:
+        found = self.db.select_by_cls_in(Game, "_id", [y.instance_game_id for y in x if y], fields=fields)
+        return [found.get(y.instance_game_id) if y else None for y in x]
 
     def game_by_external_id(self, x: Any) -> Optional[Game]:
-        return self.db.select_by_cls_fe(Game, ["external_game_id"], [x])
+        return self.first(Game, ["external_game_id"], [x])
+
+    def games_by_ids(self, x: List[Any], fields: List[str]=None) -> List[Optional[Game]]:
+        found = self.db.select_by_cls_in(Game, "_id", x, fields=fields)
+        return [found.get(y) for y in x]
 
     def game_by_ach_inst(self, x: AchievementInstance) -> Optional[Game]:
         udef = self.ach_def_by_ach_inst(x)
         if udef:
-            return self.db.select_by_cls_fe(Game, ["_id"], [udef.game_id])
+            return self.first(Game, ["_id"], [udef.game_id])
         return None
 
     def game_by_name(self, search: Any) -> Optional[Game]:
@@ -403,22 +415,28 @@ class Finder:
         return self.db.search_by_cls(search, cls=Game)
 
     def game_by_ach_def(self, x: AchievementDefinition) -> Optional[Game]:
-        return self.db.select_by_cls_fe(Game, ["_id"], [x.game_id])
+        return self.first(Game, ["_id"], [x.game_id])
 
     def games_by_ach_defs(self, x: List[AchievementDefinition]) -> List[Optional[Game]]:
-        return [self.game_by_ach_def(y) for y in x]
+        found = self.db.select_by_cls_in(Game, "_id", [y.game_id for y in x])
+        return [found.get(y.game_id) for y in x]
+
+    def ach_defs_by_game_id(self, x: Any, fields: List[str]=None) -> List[Optional[AchievementDefinition]]:
+        return self.db.select_by_cls(AchievementDefinition, ["game_id"], [x], exact=True, fields=fields)
 
-    def ach_defs_by_game_id(self, x: Any) -> List[Optional[AchievementDefinition]]:
-        return self.db.select_by_cls(AchievementDefinition, ["game_id"], [x], exact=True)
+    def ach_defs_by_game(self, x: Game, fields: List[str]=None) -> List[Optional[AchievementDefinition]]:
+        return self.ach_defs_by_game_id(x.id, fields=fields)
 
-    def ach_defs_by_game(self, x: Game) -> List[Optional[AchievementDefinition]]:
-        return self.ach_defs_by_game_id(x.id)
+    def ach_defs_by_games(self, x: List[Optional[Game]], fields: List[str]=None) -> List[List[AchievementDefinition]]:
+        found = self.db.select_by_cls_in(AchievementDefinition, "game_id", [y.id for y in x if y], first=False, fields=fields)
+        return [found.get(y.id, []) if y else [] for y in x]
 
     def ach_inst_by_ach_def(self, x: AchievementDefinition) -> Optional[AchievementInstance]:
-        return self.db.select_by_cls_fe(AchievementInstance, ["definition_id"], [x.id])
+        return self.first(AchievementInstance, ["definition_id"], [x.id])
 
-    def ach_insts_by_ach_defs(self, x: List[AchievementDefinition]) -> List[Optional[AchievementInstance]]:
-        return [self.ach_inst_by_ach_def(y) for y in x]
+    def ach_insts_by_ach_defs(self, x: List[AchievementDefinition], fields: List[str]=None) -> List[Optional[AchievementInstance]]:
+        found = self.db.select_by_cls_in(AchievementInstance, "definition_id", [y.id for y in x], fields=fields)
+        return [found.get(y.id) for y in x]
 
     def ach_insts_by_game_id(self, x: Any) -> List[Optional[AchievementInstance]]:
         ugame = self.game_by_id(x)
@@ -432,4 +450,8 @@ class Finder:
         return self.ach_insts_by_game_id(x.id)
 
     def client_context_by_game_inst(self, x: GameInstance) -> Optional[ClientContext]:
-        return self.db.select_by_cls_fe(ClientContext, ["package_name"], [x.package_name])
+        return self.first(ClientContext, ["package_name"], [x.package_name])
+
+    def client_contexts_by_game_insts(self, x: List[Optional[GameInstance]]) -> List[Optional[ClientContext]]:
+        found = self.db.select_by_cls_in(ClientContext, "package_name", [y.package_name for y in x if y])
+        return [found.get(y.package_name) if y else None for y in x]
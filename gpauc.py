@@ -0,0 +1,38 @@
+import os
+import sys
+import json
+import socket
+
+# Thin client for `gpau.py --serve`, sends its arguments as a gpau.py command
+# line and prints what the server answers. Imports nothing but the stdlib
+# basics so the start up stays cheap, the work happens in the warm server.
+#   python gpauc.py --list-ops
+#   python gpauc.py --shutdown
+
+def default_socket() -> str:
+    # same default as gpau_objects.common.default_socket
+    cache = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".gpau_cache")
+    return os.environ.get("GPAU_SOCKET", os.path.join(os.environ.get("GPAU_CACHE_DIR", cache), "gpau.sock"))
+
+def request(payload: dict, path: str) -> dict:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(path)
+        with sock.makefile("rwb") as f:
+            f.write(json.dumps(payload).encode() + b"\n")
+            f.flush()
+            return json.loads(f.readline())
+
+def main(argv: list) -> int:
+    payload = {"shutdown": True} if argv == ["--shutdown"] else {"argv": argv}
+
+    try:
+        response = request(payload, default_socket())
+    except (FileNotFoundError, ConnectionRefusedError):
+        sys.stderr.write("No server running, start one with: python gpau.py --serve\n")
+        return 1
+
+    sys.stdout.write(response["output"])
+    return response["code"]
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
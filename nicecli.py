@@ -1,13 +1,16 @@
+from __future__ import annotations
 import os
 import sys
-import time
 import argparse
 from argparse import Namespace
 from gpau_objects.common import Logger
-from terminaltables import AsciiTable # type: ignore[import-untyped]
-from gpau_objects.gpau import GooglePlayAchievementUnlocker as Gpau
-from gpau_objects.structure import *
-from typing import List, Tuple, Optional, Union
+from gpau_objects.structure import Dummy, AchievementDefinition, AchievementInstance, AchievementPendingOp, ClientContext
+from typing import TYPE_CHECKING, Callable, List, Tuple, Optional, Union
+
+# the db code, terminaltables and the profiler are imported where they're used,
+# --help doesn't wait for them
+if TYPE_CHECKING:
+    from gpau_objects.gpau import GooglePlayAchievementUnlocker as Gpau
 
 parser = argparse.ArgumentParser(epilog='By @TheNoiselessNoise')
 parser.add_argument('-i', dest='input', metavar='input', help='path to the .db file')
@@ -17,6 +20,12 @@ parser.add_argument('--ops', action='store_true', help='Show all achievement pen
 parser.add_argument('--all-games', action='store_true', help='Show all games')
 parser.add_argument('--all-games-n', action='store_true', help='Show all games not 100%% completed')
 parser.add_argument('--sort', dest='sort', type=str, help='Sort by specified column name, default: Name')
+parser.add_argument('--preload', action='store_true', help='Load the whole database into memory first, faster for big listings')
+parser.add_argument('--snapshot', action='store_true', help='Read from an in-memory copy of the database, never holds a lock on it')
+parser.add_argument('--cache-info', action='store_true', help='Show hits/misses of the lookup cache at the end')
+parser.add_argument('--stats', nargs='?', const='text', choices=['text', 'json'], help='Show query counts, timings, slow query plans and full scans at the end')
+parser.add_argument('--profile', nargs='?', metavar='file', const='nicecli.pstats', help='Profile the command with cProfile and tracemalloc, writes file (default: nicecli.pstats) and shows the top functions, allocations and phases')
+parser.add_argument('--all-players', action='store_true', help='Show --games, --ops, --all-games(-n) or --show for every player in one table')
 ach_group = parser.add_argument_group('Achievements')
 ach_group.add_argument('--info', action='store_true', help='Show info about specified game, needs -g as Game ID')
 ach_group.add_argument('--show', action='store_true', help='Show all achievements of specified game, needs -g as Package Name or Game ID')
@@ -36,6 +45,12 @@ class CliDummy:
     all_games   : bool                = False
     all_games_n : bool                = False
     sort        : Optional[str]       = None
+    preload     : bool                = False
+    snapshot    : bool                = False
+    cache_info  : bool                = False
+    stats       : Optional[str]       = None
+    profile     : Optional[str]       = None
+    all_players : bool                = False
 
     info        : bool                = False
     show        : bool                = False
@@ -52,6 +67,7 @@ def table(data: List[List[str]], title: Optional[str]=None):
             title += " (NOTHING FOUND)"
         data.append(["-"*len(x) for x in data[0]])
 
+    from terminaltables import AsciiTable # type: ignore[import-untyped]
     t = AsciiTable(data)
     if title is not None:
         print("\n+" + "-" * (len(title) + 2) + "+")
@@ -69,22 +85,28 @@ def sort_rows(rows: List[List[str]], sort: Optional[str]=None):
     _rows = sorted(rows[1:], key=lambda x: x[sindex])
     return [rows[0]] + _rows
 
+Rows = Tuple[List[List[str]], str]
+
+def show_rows(rows: Rows, sort: Optional[str]=None):
+    table(sort_rows(rows[0], sort), rows[1])
+
 def show_games(g: Gpau, sort: Optional[str]=None):
-    ccs: List[ClientContext] = g.db.select_by_cls(ClientContext)
+    show_rows(games_rows(g), sort)
 
-    games: List[Tuple[Optional[GameInstance], ClientContext]] = []
+def games_rows(g: Gpau) -> Rows:
+    ccs: List[ClientContext] = g.db.select_by_cls(ClientContext)
 
-    for cc in ccs:
-        game_inst = g.finder.game_inst_by_package_name(cc.package_name)
-        games.append((game_inst, cc))
+    game_insts = g.finder.game_insts_by_package_names([x.package_name for x in ccs], fields=["instance_game_id"])
+    games = g.finder.games_by_game_insts(game_insts, fields=["display_name"])
+    games_ach_defs = g.finder.ach_defs_by_games(games, fields=["game_id"])
+    all_ach_insts = g.finder.ach_insts_by_ach_defs([x for y in games_ach_defs for x in y], fields=["state"])
 
     rows: List[List[str]] = [["CC ID", "Game ID", "Package Name", "Name", "Achievements"]]
 
-    for ginst, cc in games:
-        game = None if not ginst else g.finder.game_by_game_inst(ginst)
-        
-        ach_defs = [] if not game else [x for x in g.finder.ach_defs_by_game(game) if x]
-        ach_insts = [x for x in g.finder.ach_insts_by_ach_defs(ach_defs) if x]
+    offset = 0
+    for ginst, cc, game, ach_defs in zip(game_insts, ccs, games, games_ach_defs):
+        ach_insts = [x for x in all_ach_insts[offset:offset + len(ach_defs)] if x]
+        offset += len(ach_defs)
         uachs = [x for x in ach_insts if x.is_unlocked()]
 
         ach_str = f"{len(uachs)}/{len(ach_insts)}" if len(ach_insts) else "-" * len(rows[0][-1])
@@ -93,7 +115,7 @@ def show_games(g: Gpau, sort: Optional[str]=None):
         display_name = game.display_name if game else "NO_GAME"
         rows.append([str(cc.id), game_id, package_name, display_name, ach_str])
 
-    table(sort_rows(rows, sort), "Games registered in cc")
+    return rows, "Games registered in cc"
 
 def show_players(g: Gpau, sort: Optional[str]=None):
     rows: List[List[str]] = [["#", "File", "Player ID", "Name", "Level"]]
@@ -110,6 +132,10 @@ def show_players(g: Gpau, sort: Optional[str]=None):
     table(sort_rows(rows, sort), "Players")
 
 def show_ops(g: Gpau):
+    rows, title = ops_rows(g)
+    table(rows, title)
+
+def ops_rows(g: Gpau) -> Rows:
     rows: List[List[str]] = [["CC ID", "Achievement ID", "Game ID", "Player ID"]]
 
     ops: List[AchievementPendingOp] = [x for x in g.db.select_by_cls(AchievementPendingOp) if x]
@@ -117,42 +143,22 @@ def show_ops(g: Gpau):
     for op in ops:
         rows.append([str(op.client_context_id), str(op.external_achievement_id), str(op.external_game_id), str(op.external_player_id)])
 
-    table(rows, "Achievement Pending Ops")
+    return rows, "Achievement Pending Ops"
 
 def show_all_games(g: Gpau, sort: Optional[str]=None, not_100: bool=False):
-    __start_time: float = time.time()
-    games: List[Game] = [x for x in g.db.select_by_cls(Game) if x]
+    show_rows(all_games_rows(g, not_100), sort)
 
+def all_games_rows(g: Gpau, not_100: bool=False) -> Rows:
     rows: List[List[str]] = [["Game ID", "Package Name", "Name", "Unlocked", "Achievements", "In CC"]]
-    index: int = 0
-    for game in games:
-        index += 1
-
-        if not game.display_name:
-            inst = g.finder.game_inst_by_game(game)
-            if not inst:
-                continue
-            game.display_name = inst.package_name
 
-        ach_defs = [x for x in g.finder.ach_defs_by_game(game) if x]
-        ach_insts = g.finder.ach_insts_by_ach_defs(ach_defs)
-        uachs = [x for x in ach_insts if x and x.is_unlocked()]
-
-        game_inst = g.finder.game_inst_by_game(game)
-        cc = g.finder.client_context_by_game_inst(game_inst) if game_inst else None
-        in_cc = "Yes" if cc else "No"
-
-        print(f"Processed {index}/{len(games)} games in {time.time() - __start_time:.2f}s", end="\r")
-        if not_100 and (not ach_defs or len(uachs) == len(ach_insts)):
-            continue
-
-        package_name = "NO_INSTANCE" if game_inst is None else game_inst.package_name
-        rows.append([str(game.id), package_name, game.display_name, str(len(uachs)), str(len(ach_insts)), in_cc])
+    for game_id, package_name, display_name, unlocked, total, in_cc in g.db.game_completion_stats(not_100):
+        package_name = "NO_INSTANCE" if package_name is None else package_name
+        rows.append([str(game_id), package_name, display_name, str(unlocked), str(total), "Yes" if in_cc else "No"])
 
     title = "All Games"
     if not_100:
         title += " (NOT 100% Completed)"
-    table(sort_rows(rows, sort), title)
+    return rows, title
 
 def show_all_games_n(g: Gpau, sort: Optional[str]=None):
     show_all_games(g, sort=sort, not_100=True)
@@ -171,20 +177,26 @@ def get_achievement_state(ach_def: AchievementDefinition, ach_inst: AchievementI
         return f"{ach_inst.current_steps}/{ach_def.total_steps}"
     return "LOCKED"
 
+# columns the achievement table reads
+show_achs_def_fields = ["type", "external_achievement_id", "name", "description", "total_steps", "initial_state"]
+
 def show_achs(g: Gpau, name: str, sort: Optional[str]=None):
+    rows, title = achs_rows(g, name)
+    if len(rows) == 1:
+        rows.append(["-"*len(x) for x in rows[0]])
+    table(sort_rows(rows, sort), title)
+
+def achs_rows(g: Gpau, name: str) -> Rows:
     game = find_game(g, name, use_game_id=True)
     if not game:
         Logger.error_exit(f"Game with Package Name or Game ID '{name}' not found")
 
     game_inst = g.finder.game_inst_by_game(game)
-    ach_defs = [x for x in g.finder.ach_defs_by_game(game) if x]
-    ach_insts = g.finder.ach_insts_by_ach_defs(ach_defs)
+    ach_defs = [x for x in g.finder.ach_defs_by_game(game, fields=show_achs_def_fields) if x]
+    ach_insts = g.finder.ach_insts_by_ach_defs(ach_defs, fields=["state", "current_steps"])
 
     rows: List[List[str]] = [["Type", "External ID", "Name", "Description", "State"]]
 
-    if not ach_defs:
-        rows.append(["-"*len(x) for x in rows[0]])
-
     for d, i in zip(ach_defs, ach_insts):
         ach_type = get_achievement_type(d)
         ach_exid = d.external_achievement_id
@@ -196,7 +208,37 @@ def show_achs(g: Gpau, name: str, sort: Optional[str]=None):
 
     display_name = game.display_name if game.display_name else "NO_GAME"
     package_name = "NO_INSTANCE" if game_inst is None else game_inst.package_name
-    table(sort_rows(rows, sort), f"{display_name} ({package_name})")
+    return rows, f"{display_name} ({package_name})"
+
+def show_all_players(args: Union[Namespace, CliDummy], get_rows: Callable[[Gpau], Rows]):
+    from gpau_objects.accounts import for_each_account
+    from gpau_objects.gpau import GooglePlayAchievementUnlocker as Gpau
+
+    # every account db is read on its own connection, the rows end up in one table
+    def work(file: str) -> Rows:
+        dummy = Dummy()
+        dummy.input = file
+        dummy.preload = args.preload
+        dummy.snapshot = args.snapshot
+        g = Gpau(dummy)
+        try:
+            return get_rows(g)
+        finally:
+            g.db.close()
+
+    rows: List[List[str]] = []
+    title = "All Players"
+    for _, label, result in for_each_account(Gpau.get_db_files(), work):
+        if result is None:
+            continue
+        account_rows, title = result
+        if not rows:
+            rows.append(["Account"] + account_rows[0])
+        rows += [[label] + x for x in account_rows[1:]]
+
+    if not rows:
+        Logger.error_exit("No player could be read")
+    table(sort_rows(rows, args.sort), title)
 
 def find_game(g: Gpau, name_or_ccid: str, use_game_id=False):
     if name_or_ccid.isdigit():
@@ -218,22 +260,20 @@ def unlock_all_achs(g: Gpau, ccid: str):
         Logger.error_exit(f"Game with Package Name or CC ID '{ccid}' not found")
 
     ach_defs = [x for x in g.finder.ach_defs_by_game(game) if x]
-    for ach_def in ach_defs:
-        g.unlock_achievement(ach_def)
+    g.unlock_achievements(ach_defs)
 
 def unlock_ach(g: Gpau, ach_external_id: str):
-    g.args.auto_inc_achs = True
+    unlock_achs(g, [ach_external_id])
 
-    ach_def = g.finder.ach_def_by_external_id(ach_external_id)
-    if not ach_def:
-        Logger.warning(f"Achievement with External ID '{ach_external_id}' not found")
-        return
+def unlock_achs(g: Gpau, ach_external_ids: List[str]):
+    g.args.auto_inc_achs = True
 
-    g.unlock_achievement(ach_def)
+    ach_defs = g.finder.ach_defs_by_external_ids(ach_external_ids)
+    for ach_external_id, ach_def in zip(ach_external_ids, ach_defs):
+        if not ach_def:
+            Logger.warning(f"Achievement with External ID '{ach_external_id}' not found")
 
-def unlock_achs(g: Gpau, ach_external_ids: List[str]):
-    for ach in ach_external_ids:
-        unlock_ach(g, ach)
+    g.unlock_achievements(ach_defs)
 
 def show_game_info(g: Gpau, gid: str):
     game = find_game(g, gid, use_game_id=True)
@@ -250,9 +290,26 @@ def show_game_info(g: Gpau, gid: str):
 def main(cli_args):
     args: Union[Namespace, CliDummy] = cli_args
 
+    if args.all_players:
+        if args.games:
+            show_all_players(args, games_rows)
+        elif args.ops:
+            show_all_players(args, ops_rows)
+        elif args.all_games or args.all_games_n:
+            show_all_players(args, lambda g: all_games_rows(g, not_100=args.all_games_n))
+        elif args.show and args.game:
+            show_all_players(args, lambda g: achs_rows(g, args.game))
+        else:
+            Logger.error_exit("--all-players works only with --games, --ops, --all-games(-n) and --show")
+        return
+
+    from gpau_objects.gpau import GooglePlayAchievementUnlocker as Gpau
     dummy = Dummy()
     dummy.input = args.input
     dummy.player = args.player
+    dummy.preload = args.preload
+    dummy.snapshot = args.snapshot
+    dummy.stats = args.stats
     g = Gpau(dummy)
 
     if args.games:
@@ -276,8 +333,18 @@ def main(cli_args):
     elif args.unlock_all and args.game:
         unlock_all_achs(g, args.game)
 
+    if args.cache_info:
+        Logger.info(f"Finder cache: {g.finder.cache_info()}")
+    if args.stats:
+        g.report_stats()
+
 if __name__ == '__main__':
     if not len(sys.argv[1:]):
         parser.print_help()
         sys.exit()
-    main(parser.parse_args())
+    cli_args = parser.parse_args()
+    if cli_args.profile:
+        from gpau_objects.profiling import Profile
+        Profile(cli_args.profile).run(main, cli_args)
+    else:
+        main(cli_args)